@@ -1,18 +1,34 @@
 # analysis.py
 
-import google.generativeai as genai
 import json
 import re
 import os
+from concurrent.futures import ThreadPoolExecutor
+from prompt_builder import build_articles_block
+import keyphrase
+import llm_client
+import telemetry
+
+# Token budget for the whole theme-extraction prompt (instructions + articles)
+ANALYSIS_PROMPT_TOKEN_BUDGET = int(os.getenv("ANALYSIS_PROMPT_TOKEN_BUDGET", "12000"))
+
+# Map-reduce theme extraction for large article sets
+MAP_REDUCE_MIN_ARTICLES = int(os.getenv("MAP_REDUCE_MIN_ARTICLES", "60"))
+MAP_CHUNK_SIZE = int(os.getenv("MAP_CHUNK_SIZE", "30"))
+ANALYSIS_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "4"))
+MAX_MERGED_THEMES = 7
+
+# "llm": Gemini only (local ranker as fallback), "hybrid": local pre-filter narrows the
+# articles sent to Gemini, "local": keyphrase ranker only (no API cost)
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "llm").lower()
+HYBRID_MAX_ARTICLES = int(os.getenv("HYBRID_MAX_ARTICLES", "40"))
 
 # ----------------- AI CONFIG -----------------
 def configure_ai():
     """Configures Google Generative AI with API key."""
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    if not llm_client.configure():
         print("  -> [ERROR] Analysis: GEMINI_API_KEY not found in environment.")
         return False
-    genai.configure(api_key=api_key)
     return True
 
 # ----------------- PROMPTS -----------------
@@ -38,60 +54,139 @@ Rank them by relevance (most discussed first).
 """
 
 # ----------------- THEME DISCOVERY -----------------
-def find_highest_discussed_themes(articles):
-    """Analyzes scraped articles and returns ranked themes."""
-    print("  -> Analysis: Analyzing articles to find the highest discussed themes...")
-
-    if not articles:
-        print("  -> [WARNING] Analysis: No articles provided.")
-        return []
-
-    # Build the text input
-    articles_text = "\n".join(
-        [f"Title: {a.get('title','')}\nSummary: {a.get('summary','')}" for a in articles]
-    )
-
+def _parse_themes(raw_text):
+    """Parses the theme list out of a model response (JSON, fenced JSON or "-" bullets)."""
+    # First attempt: JSON parsing
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash-latest")
-        response = model.generate_content(THEME_EXTRACTION_PROMPT + "\n\n" + articles_text)
+        data = json.loads(raw_text)
+        themes = data.get("themes", [])
+        if themes:
+            return [t.strip() for t in themes]
+    except json.JSONDecodeError:
+        pass
 
-        raw_text = response.text.strip()
-        # Debug logging
-        print("  -> Analysis: Raw AI output (first 300 chars):")
-        print(raw_text[:300].replace("\n", " ") + "...")
-        
-        # First attempt: JSON parsing
+    # Fallback: extract JSON substring if Gemini wrapped it in markdown
+    json_match = re.search(r"\{[\s\S]*\}", raw_text)
+    if json_match:
         try:
-            data = json.loads(raw_text)
+            data = json.loads(json_match.group(0))
             themes = data.get("themes", [])
             if themes:
                 return [t.strip() for t in themes]
-        except json.JSONDecodeError:
+        except:
             pass
 
-        # Fallback: extract JSON substring if Gemini wrapped it in markdown
-        json_match = re.search(r"\{[\s\S]*\}", raw_text)
-        if json_match:
-            try:
-                data = json.loads(json_match.group(0))
-                themes = data.get("themes", [])
-                if themes:
-                    return [t.strip() for t in themes]
-            except:
-                pass
-
-        # Last fallback: extract lines starting with "-"
-        themes = re.findall(r"-\s*(.+)", raw_text)
-        if themes:
-            return [t.strip() for t in themes]
+    # Last fallback: extract lines starting with "-"
+    themes = re.findall(r"-\s*(.+)", raw_text)
+    return [t.strip() for t in themes]
+
+def _extract_themes(articles, label="Theme extraction"):
+    """
+    Runs one theme-extraction call over the given articles.
+    Returns the ranked themes ([] if unparsable), or None if the call itself failed.
+    """
+    # Build the text input within the prompt token budget
+    articles_text, _ = build_articles_block(
+        articles, ANALYSIS_PROMPT_TOKEN_BUDGET, reserved_text=THEME_EXTRACTION_PROMPT, label=label
+    )
 
-        print("  -> [WARNING] Analysis: AI returned no parsable themes.")
-        return []
+    try:
+        with telemetry.span("analysis.extract_themes", label=label, articles=len(articles)):
+            raw_text = llm_client.generate(THEME_EXTRACTION_PROMPT + "\n\n" + articles_text)
+        # Debug logging
+        print(f"  -> Analysis: Raw AI output for {label} (first 300 chars):")
+        print(raw_text[:300].replace("\n", " ") + "...")
+        return _parse_themes(raw_text)
 
     except Exception as e:
-        print(f"  -> [ERROR] Analysis: Failed during theme extraction. Error: {e}")
+        print(f"  -> [ERROR] Analysis: Failed during {label}. Error: {e}")
+        return None
+
+def _theme_words(theme):
+    """Lowercased content words with a naive plural strip, used to match equivalent phrasings."""
+    words = re.findall(r"[a-z0-9]+", theme.lower())
+    return {w[:-1] if len(w) > 3 and w.endswith("s") else w for w in words}
+
+def _merge_chunk_themes(chunk_results, top_n=MAX_MERGED_THEMES):
+    """
+    Local reduce step: merges per-chunk ranked themes into one ranking.
+    Each mention scores chunk_size * (1 / (rank + 1)); themes whose word sets overlap
+    strongly (Jaccard >= 0.6) are folded into the first-seen phrasing.
+    """
+    merged = []  # [display phrase, word set, score, mentions]
+    for chunk_size, themes in chunk_results:
+        for rank, theme in enumerate(themes):
+            words = _theme_words(theme)
+            if not words:
+                continue
+            weight = chunk_size / (rank + 1)
+            for entry in merged:
+                if len(words & entry[1]) / len(words | entry[1]) >= 0.6:
+                    entry[2] += weight
+                    entry[3] += 1
+                    break
+            else:
+                merged.append([theme.strip(), words, weight, 1])
+    merged.sort(key=lambda e: (e[3], e[2]), reverse=True)
+    return [e[0] for e in merged[:top_n]]
+
+def _find_themes_map_reduce(articles):
+    """Map: extract themes from article chunks concurrently. Reduce: frequency-weighted local merge."""
+    chunks = [articles[i:i + MAP_CHUNK_SIZE] for i in range(0, len(articles), MAP_CHUNK_SIZE)]
+    print(f"  -> Analysis: Map-reduce over {len(chunks)} chunks of up to {MAP_CHUNK_SIZE} articles...")
+
+    workers = max(1, min(ANALYSIS_MAX_CONCURRENCY, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(
+            lambda item: _extract_themes(item[1], label=f"theme extraction chunk {item[0] + 1}/{len(chunks)}"),
+            enumerate(chunks)
+        ))
+
+    failed = sum(1 for r in results if r is None)
+    if failed:
+        print(f"  -> [WARNING] Analysis: {failed}/{len(chunks)} chunks failed; merging the rest.")
+    return _merge_chunk_themes([(len(c), r) for c, r in zip(chunks, results) if r])
+
+def find_highest_discussed_themes(articles, map_reduce=None, mode=None):
+    """
+    Analyzes scraped articles and returns ranked themes.
+    map_reduce: True/False to force the mode; None picks map-reduce when there are more
+    than MAP_REDUCE_MIN_ARTICLES articles.
+    mode: "llm", "hybrid" or "local" (defaults to ANALYSIS_MODE). Whenever the LLM path fails
+    or returns nothing, the local keyphrase ranker is used instead.
+    """
+    print("  -> Analysis: Analyzing articles to find the highest discussed themes...")
+
+    if not articles:
+        print("  -> [WARNING] Analysis: No articles provided.")
         return []
 
+    with telemetry.span("analysis.find_themes") as span:
+        mode = (mode or ANALYSIS_MODE).lower()
+        span.update(mode=mode, articles=len(articles))
+        if mode == "local":
+            themes = keyphrase.extract_themes(articles, top_n=MAX_MERGED_THEMES)
+            print(f"  -> Analysis: Local keyphrase ranker found {len(themes)} themes.")
+            span["themes"] = len(themes)
+            return themes
+
+        if mode == "hybrid":
+            selected = keyphrase.select_representative_articles(articles, HYBRID_MAX_ARTICLES)
+            if len(selected) < len(articles):
+                print(f"  -> Analysis: Local pre-filter kept {len(selected)}/{len(articles)} articles for the LLM.")
+            articles = selected
+
+        if map_reduce is None:
+            map_reduce = len(articles) > MAP_REDUCE_MIN_ARTICLES
+
+        themes = _find_themes_map_reduce(articles) if map_reduce else _extract_themes(articles)
+        if not themes:
+            print("  -> [WARNING] Analysis: AI returned no parsable themes; falling back to local keyphrase ranker.")
+            telemetry.incr("analysis_fallbacks")
+            themes = keyphrase.extract_themes(articles, top_n=MAX_MERGED_THEMES)
+        span["themes"] = len(themes)
+        return themes
+
 # ----------------- SEARCH THEME DISCOVERY -----------------
 DISCOVER_NEW_SEARCH_PROMPT = """
 You are helping expand search coverage for Kenyan real estate content.
@@ -116,14 +211,12 @@ def discover_new_search_themes(current_themes, processed_themes):
     """Suggests new search themes to broaden coverage."""
     print("  -> Analysis: Discovering new search themes...")
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash-latest")
         prompt = DISCOVER_NEW_SEARCH_PROMPT + f"""
 
 Current search themes: {list(current_themes)}
 Already covered themes: {list(processed_themes)}
 """
-        response = model.generate_content(prompt)
-        raw_text = response.text.strip()
+        raw_text = llm_client.generate(prompt)
 
         # Debug logging
         print("  -> Analysis: Raw AI discovery output (first 200 chars):")
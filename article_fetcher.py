@@ -0,0 +1,245 @@
+# article_fetcher.py
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+import telemetry
+
+# ----------------- CONFIG -----------------
+FULLTEXT_ENABLED = os.getenv("FULLTEXT_ENABLED", "0") == "1"
+FULLTEXT_CACHE_FILE = os.getenv("FULLTEXT_CACHE_FILE", "article_bodies.db")
+FULLTEXT_DEADLINE_SECONDS = float(os.getenv("FULLTEXT_DEADLINE_SECONDS", "20"))  # Whole enrichment stage, all articles
+FULLTEXT_REQUEST_TIMEOUT_SECONDS = float(os.getenv("FULLTEXT_REQUEST_TIMEOUT_SECONDS", "10"))
+FULLTEXT_MAX_CONCURRENCY = int(os.getenv("FULLTEXT_MAX_CONCURRENCY", "16"))
+FULLTEXT_PER_HOST = int(os.getenv("FULLTEXT_PER_HOST", "2"))  # Be polite to each news site
+FULLTEXT_REVALIDATE_SECONDS = int(os.getenv("FULLTEXT_REVALIDATE_SECONDS", str(6 * 3600)))  # Cached bodies used as-is this long
+FULLTEXT_RETRY_FAILED_SECONDS = 3600  # Pages that failed are not retried before this
+FULLTEXT_CACHE_MAX_AGE_DAYS = 30
+FULLTEXT_MAX_BYTES = 2 * 1024 * 1024
+FULLTEXT_MAX_CHARS = 6000  # Extracted text kept per article
+MIN_PARAGRAPH_CHARS = 40
+USER_AGENT = "Mozilla/5.0 (compatible; KenyaRealEstateContentEngine/1.0)"
+
+# ----------------- EXTRACTION -----------------
+_SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "figure", "iframe", "svg", "button"}
+_BLOCK_TAGS = {"p", "h1", "h2", "h3", "h4", "li", "blockquote"}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+class _MainTextParser(HTMLParser):
+    """Collects paragraph-level text blocks, noting which ones sit inside <article>/<main>."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []  # (text, in_main)
+        self._skip = 0
+        self._main = 0
+        self._block = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_TAGS:
+            return
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag in ("article", "main"):
+            self._main += 1
+        elif tag in _BLOCK_TAGS and not self._skip:
+            self._flush()
+            self._block = []
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in ("article", "main"):
+            self._flush()
+            self._main = max(self._main - 1, 0)
+        elif tag in _BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._block is not None and not self._skip:
+            self._block.append(data)
+
+    def _flush(self):
+        if self._block:
+            text = re.sub(r"\s+", " ", "".join(self._block)).strip()
+            if text:
+                self.blocks.append((text, self._main > 0))
+        self._block = None
+
+def extract_main_text(html, max_chars=FULLTEXT_MAX_CHARS):
+    """
+    Main article text from an HTML page: paragraph blocks inside <article>/<main> when the page has
+    them, otherwise all paragraphs long enough to be prose. Navigation, scripts and boilerplate
+    containers are skipped. Returns "" when nothing usable is found.
+    """
+    parser = _MainTextParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass
+    parser._flush()
+    blocks = [text for text, in_main in parser.blocks if in_main] or [text for text, _ in parser.blocks]
+    paragraphs = [b for b in dict.fromkeys(blocks) if len(b) >= MIN_PARAGRAPH_CHARS]
+    text = "\n".join(paragraphs)
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0] + "..."
+    return text
+
+# ----------------- CACHE -----------------
+class BodyCache:
+    """
+    Extracted article bodies per URL with the validators (ETag / Last-Modified) needed to
+    revalidate them, so an unchanged page is answered with a 304 instead of being downloaded again.
+    """
+    def __init__(self, path=FULLTEXT_CACHE_FILE):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bodies (url TEXT PRIMARY KEY, body TEXT, etag TEXT, last_modified TEXT,"
+                " fetched_at REAL NOT NULL, checked_at REAL NOT NULL)"
+            )
+            conn.execute("DELETE FROM bodies WHERE checked_at < ?", (time.time() - FULLTEXT_CACHE_MAX_AGE_DAYS * 86400,))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, url):
+        """(body, etag, last_modified, fetched_at, checked_at) or None. body is None for pages that failed."""
+        with self._lock:
+            return self._connect().execute(
+                "SELECT body, etag, last_modified, fetched_at, checked_at FROM bodies WHERE url = ?", (url,)
+            ).fetchone()
+
+    def put(self, url, body, etag=None, last_modified=None):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO bodies (url, body, etag, last_modified, fetched_at, checked_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, now, now),
+            )
+            conn.commit()
+
+    def touch(self, url):
+        """Records a successful revalidation (304)."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE bodies SET checked_at = ? WHERE url = ?", (time.time(), url))
+            conn.commit()
+
+body_cache = BodyCache()
+
+# ----------------- FETCHING -----------------
+async def _read_limited(resp, limit=FULLTEXT_MAX_BYTES):
+    chunks, size = [], 0
+    async for chunk in resp.content.iter_chunked(64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            break
+    return b"".join(chunks)[:limit].decode(resp.charset or "utf-8", errors="replace")
+
+async def _fetch_body(session, url):
+    """
+    Returns (body or None, outcome) for one URL. Fresh cache entries are used without a request;
+    stale ones are revalidated with If-None-Match / If-Modified-Since.
+    """
+    import aiohttp
+    cached = body_cache.get(url)
+    now = time.time()
+    if cached:
+        body, etag, last_modified, _, checked_at = cached
+        if body is None and now - checked_at < FULLTEXT_RETRY_FAILED_SECONDS:
+            return None, "failed_cached"
+        if body is not None and now - checked_at < FULLTEXT_REVALIDATE_SECONDS:
+            return body, "cached"
+    headers = {"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml"}
+    if cached and cached[0] is not None:
+        if cached[1]:
+            headers["If-None-Match"] = cached[1]
+        if cached[2]:
+            headers["If-Modified-Since"] = cached[2]
+    try:
+        async with session.get(url, headers=headers, allow_redirects=True) as resp:
+            telemetry.incr("api_calls", provider="article_site", endpoint="page")
+            if resp.status == 304 and cached:
+                body_cache.touch(url)
+                return cached[0], "not_modified"
+            content_type = resp.headers.get("Content-Type", "").lower()
+            if resp.status != 200 or ("html" not in content_type and "xml" not in content_type):
+                body_cache.put(url, None)
+                return None, f"http_{resp.status}"
+            html = await _read_limited(resp)
+            body = extract_main_text(html) or None
+            body_cache.put(url, body, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+            telemetry.incr("fulltext_bytes", len(html))
+            return body, "downloaded" if body else "no_text"
+    except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError, ValueError) as e:
+        telemetry.incr("api_errors", provider="article_site", endpoint="page")
+        if cached and cached[0] is not None:
+            return cached[0], "stale"  # Keep the old body; revalidate again next time
+        body_cache.put(url, None)
+        return None, type(e).__name__
+
+async def _fetch_all(urls, deadline):
+    import aiohttp  # Imported lazily so runs without enrichment never load it
+    connector = aiohttp.TCPConnector(limit=FULLTEXT_MAX_CONCURRENCY, limit_per_host=FULLTEXT_PER_HOST, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=FULLTEXT_REQUEST_TIMEOUT_SECONDS)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        tasks = {asyncio.ensure_future(_fetch_body(session, url)): url for url in urls}
+        done, pending = await asyncio.wait(tasks, timeout=max(deadline - time.monotonic(), 0))
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        results = {}
+        for task in done:
+            try:
+                results[tasks[task]] = task.result()
+            except Exception as e:
+                results[tasks[task]] = (None, type(e).__name__)
+        for task in pending:
+            results[tasks[task]] = (None, "deadline")
+        return results
+
+def enrich_articles(articles, deadline_seconds=None):
+    """
+    Adds a "body" (extracted main text) to each article whose page could be fetched within
+    `deadline_seconds` (FULLTEXT_DEADLINE_SECONDS) for the whole batch. Pages are fetched
+    concurrently through one pooled session with per-host limits; articles that miss the deadline
+    or fail keep only their SerpApi summary. Returns the number of articles with a body.
+    """
+    deadline_seconds = FULLTEXT_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds
+    urls = list(dict.fromkeys(a["link"] for a in articles if (a.get("link") or "").startswith(("http://", "https://"))))
+    if not urls:
+        return 0
+    with telemetry.span("fulltext.enrich", urls=len(urls), hosts=len({urlsplit(u).netloc for u in urls})) as span:
+        try:
+            results = asyncio.run(_fetch_all(urls, time.monotonic() + deadline_seconds))
+        except Exception as e:
+            print(f"  -> [ERROR] ArticleFetcher: Full-text fetching failed. Error: {e}")
+            return 0
+        outcomes = {}
+        for _, outcome in results.values():
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            telemetry.incr("fulltext_fetches", outcome=outcome)
+        enriched = 0
+        for article in articles:
+            body = results.get(article.get("link"), (None, None))[0]
+            if body:
+                article["body"] = body
+                enriched += 1
+        span.update(enriched=enriched, **outcomes)
+    print(f"  -> [INFO] ArticleFetcher: Full text for {enriched}/{len(articles)} articles {outcomes}.")
+    return enriched
@@ -0,0 +1,108 @@
+# article_store.py
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from dedup import canonical_url
+
+ARTICLE_STORE_FILE = os.getenv("ARTICLE_STORE_FILE", "article_store.db")
+
+_RELATIVE_UNITS = {"min": timedelta(minutes=1), "minute": timedelta(minutes=1), "hour": timedelta(hours=1),
+                   "day": timedelta(days=1), "week": timedelta(weeks=1), "month": timedelta(days=30), "year": timedelta(days=365)}
+
+def parse_article_date(raw, default, now=None):
+    """
+    Extracts a YYYY-MM-DD date from a SerpApi result: "iso_date", a "MM/DD/YYYY, ..." style "date",
+    or a relative "date" ("3 hours ago", "2 days ago", "yesterday") resolved against `now`.
+    Returns `default` when nothing parsable is present; callers pass the fetch's end date (today)
+    so undated results count as first seen on this fetch.
+    """
+    iso = raw.get("iso_date") if isinstance(raw, dict) else None
+    if iso and re.match(r"\d{4}-\d{2}-\d{2}", iso):
+        return iso[:10]
+    text = (raw.get("date") if isinstance(raw, dict) else raw) or ""
+    match = re.search(r"(\d{2})/(\d{2})/(\d{4})", text)
+    if match:
+        month, day, year = match.groups()
+        return f"{year}-{month}-{day}"
+    now = now or datetime.now()
+    lowered = text.strip().lower()
+    if lowered in ("today", "just now") or lowered.endswith("now"):
+        return now.strftime("%Y-%m-%d")
+    if lowered == "yesterday":
+        return (now - timedelta(days=1)).strftime("%Y-%m-%d")
+    match = re.match(r"(\d+|an?|one)\s+(minute|min|hour|day|week|month|year)s?\s+ago", lowered)
+    if match:
+        count = 1 if match.group(1) in ("a", "an", "one") else int(match.group(1))
+        return (now - count * _RELATIVE_UNITS[match.group(2)]).strftime("%Y-%m-%d")
+    return default
+
+class ArticleStore:
+    """
+    Local SQLite store of scraped articles plus a per-theme high-water mark,
+    so daily runs only fetch the delta since the last successful fetch.
+    """
+    def __init__(self, path=ARTICLE_STORE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            " url_key TEXT NOT NULL, theme TEXT NOT NULL, title TEXT NOT NULL, link TEXT NOT NULL,"
+            " summary TEXT NOT NULL, published TEXT NOT NULL, first_seen TEXT NOT NULL,"
+            " PRIMARY KEY (url_key, theme));"
+            "CREATE INDEX IF NOT EXISTS idx_articles_theme_published ON articles(theme, published);"
+            "CREATE TABLE IF NOT EXISTS watermarks (theme TEXT PRIMARY KEY, fetched_through TEXT NOT NULL);"
+        )
+        self._conn.commit()
+
+    def get_watermark(self, theme):
+        """Returns the YYYY-MM-DD date the theme was last fetched through, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT fetched_through FROM watermarks WHERE theme = ?", (theme,)).fetchone()
+        return row[0] if row else None
+
+    def fetch_start_date(self, theme, start_date):
+        """
+        Start of the window still to be fetched for a theme. The watermark day itself is re-queried
+        because SerpApi date filters are day-granular.
+        """
+        watermark = self.get_watermark(theme)
+        return max(start_date, watermark) if watermark else start_date
+
+    def record_fetch(self, theme, articles, fetched_through):
+        """Stores a successful fetch for the theme and advances its watermark."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        rows = [
+            (canonical_url(a["link"]) or a["link"], theme, a["title"], a["link"], a.get("summary", ""),
+             a.get("published") or today, today)
+            for a in articles
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO articles (url_key, theme, title, link, summary, published, first_seen)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "INSERT INTO watermarks (theme, fetched_through) VALUES (?, ?)"
+                " ON CONFLICT(theme) DO UPDATE SET fetched_through = MAX(fetched_through, excluded.fetched_through)",
+                (theme, fetched_through),
+            )
+            self._conn.commit()
+
+    def get_articles(self, theme, start_date, end_date):
+        """Returns stored articles for the theme published within [start_date, end_date], newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT title, link, summary, published FROM articles WHERE theme = ? AND published BETWEEN ? AND ?"
+                " ORDER BY published DESC, rowid ASC",
+                (theme, start_date, end_date),
+            ).fetchall()
+        return [{"title": t, "link": l, "summary": s, "published": p} for t, l, s, p in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,467 @@
+# benchmark.py
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+
+import newfd
+
+BASELINE_FILE = "benchmark_baselines.json"
+DEFAULT_TOLERANCE = 0.25  # Allowed slowdown / memory growth vs the stored baseline before flagging a regression
+MIN_COMPARABLE_SECONDS = 0.05  # Stages faster than this are too noisy to compare on time
+
+# ----------------- SYNTHETIC CONTENT -----------------
+_WORDS = (
+    "nairobi kenya housing affordable mortgage rates land prices investors developers rental market "
+    "units government project demand supply county infrastructure buyers financing growth"
+).split()
+
+_THEMES = [
+    "Affordable housing projects in Nairobi", "Mortgage rate changes", "Foreign investment in Kenyan property",
+    "Land prices in satellite towns", "Nairobi rental market pressure", "Smart cities and infrastructure",
+    "Urbanization challenges", "Commercial real estate demand",
+]
+
+def make_blog_text(words=900, seed=None):
+    """Blog-shaped text: headings, paragraphs, bullets and sentences of varying length."""
+    rng = random.Random(seed)
+    parts, count = ["# Market Outlook"], 0
+    while count < words:
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            n = rng.randint(6, 22)
+            sentences.append(" ".join(rng.choice(_WORDS) for _ in range(n)).capitalize() + rng.choice([".", ".", "?", "!"]))
+            count += n
+        parts.append(" ".join(sentences))
+        if rng.random() < 0.3:
+            parts.append("Key points:\n- " + "\n- ".join(" ".join(rng.sample(_WORDS, 4)) for _ in range(3)))
+    parts.append("Call us today to learn more.")
+    return "\n\n".join(parts)
+
+# ----------------- FAKE PROVIDERS -----------------
+class FakeProfile:
+    """Latency (seconds per call), failure rate (0..1) and corpus size shared by all fakes."""
+    def __init__(self, latency=0.05, failure_rate=0.0, articles_per_theme=20, words=900, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.articles_per_theme = articles_per_theme
+        self.words = words
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def as_dict(self):
+        return {"latency": self.latency, "failure_rate": self.failure_rate,
+                "articles_per_theme": self.articles_per_theme, "words": self.words, "seed": self.seed}
+
+    def roll(self):
+        """Sleeps for one call's latency and returns True when the call should fail."""
+        time.sleep(self.latency)
+        with self._lock:
+            return self._rng.random() < self.failure_rate
+
+    def randint(self, a, b):
+        with self._lock:
+            return self._rng.randint(a, b)
+
+class FakeServiceUnavailable(Exception):
+    """Retryable provider error (llm_client treats code 503 like the real API's)."""
+    code = 503
+
+class FakeSearchClient:
+    """Stands in for serpapi.GoogleSearch; set `profile` and `image_base` before use."""
+    profile = None
+    image_base = "http://127.0.0.1"
+
+    def __init__(self, params):
+        self.params = params
+
+    def get_dict(self):
+        profile = FakeSearchClient.profile
+        if profile.roll():
+            raise RuntimeError("fake SerpApi failure")
+        query = self.params.get("q", "")
+        if self.params.get("engine") == "google_images":
+            return {"images_results": [
+                {"source": "images.example", "original": f"{FakeSearchClient.image_base}/img/{zlib.crc32(query.encode())}-{i}.jpg"}
+                for i in range(5)
+            ]}
+        news = []
+        for i in range(profile.articles_per_theme):
+            theme = _THEMES[(zlib.crc32(query.encode()) + i) % len(_THEMES)]
+            news.append({
+                "title": f"{theme}: {' '.join(_WORDS[(i + j) % len(_WORDS)] for j in range(6))}",
+                "link": f"https://news.example/{zlib.crc32(query.encode())}/{i}",
+                "snippet": " ".join(_WORDS[(i * 3 + j) % len(_WORDS)] for j in range(25)),
+                "date": "2 days ago",
+            })
+        return {"news_results": news}
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeGeminiModel:
+    """Stands in for genai.GenerativeModel; answers each engine prompt in the format its parser expects."""
+    def __init__(self, profile):
+        self.profile = profile
+        self.calls = 0
+
+    def _answer(self, prompt):
+        if "search_queries" in prompt:
+            return json.dumps({"search_queries": [f"{t} 2025" for t in _THEMES[:4]]})
+        if "main discussed themes" in prompt:
+            start = self.profile.randint(0, len(_THEMES) - 1)
+            return json.dumps({"themes": [_THEMES[(start + i) % len(_THEMES)] for i in range(5)]})
+        if "Chosen Theme" in prompt:
+            seed = self.profile.randint(0, 10 ** 6)
+            return f"Title: Market Outlook {seed}\nBlog Post:\n" + make_blog_text(self.profile.words, seed=seed)
+        return "🏠 Nairobi property insight.\nPrices are shifting fast. Buyers are watching rates. Dive into the full analysis here."
+
+    def generate_content(self, prompt, generation_config=None, request_options=None, stream=False):
+        self.calls += 1
+        if self.profile.roll():
+            raise FakeServiceUnavailable("fake Gemini 503")
+        text = self._answer(prompt)
+        if stream:
+            return iter([_FakeResponse(text[i:i + 200]) for i in range(0, len(text), 200)])
+        return _FakeResponse(text)
+
+class FakeHttpServer:
+    """
+    Local aiohttp server standing in for the Telegram Bot API (POST /bot<token>/sendMessage)
+    and for image hosts (HEAD/GET /img/<name>). Runs on its own thread and event loop.
+    """
+    def __init__(self, profile):
+        self.profile = profile
+        self.sent = 0
+        self.url = None
+        self._loop = None
+        self._runner = None
+        self._ready = threading.Event()
+
+    async def _send_message(self, request):
+        await asyncio.sleep(self.profile.latency)
+        if self.profile.randint(0, 10 ** 6) < self.profile.failure_rate * 10 ** 6:
+            return self._web.json_response({"ok": False, "description": "fake failure"}, status=500)
+        self.sent += 1
+        return self._web.json_response({"ok": True, "result": {"message_id": self.sent}})
+
+    async def _image(self, request):
+        return self._web.Response(body=b"\xff\xd8\xff", content_type="image/jpeg")
+
+    def _serve(self):
+        from aiohttp import web
+        self._web = web
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        app.router.add_post("/{bot}/sendMessage", self._send_message)
+        app.router.add_route("*", "/img/{name}", self._image)
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        self._loop.run_until_complete(site.start())
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}"
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self):
+        threading.Thread(target=self._serve, name="bench-http", daemon=True).start()
+        self._ready.wait(10)
+        return self
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+@contextlib.contextmanager
+def scratch_workdir():
+    """
+    Runs the block in a throwaway working directory with a fresh newfd history store, so scoring
+    never creates or migrates feedback_history.jsonl in the caller's directory.
+    """
+    from history_store import HistoryStore
+
+    workdir = tempfile.mkdtemp(prefix="engine-bench-")
+    previous_cwd = os.getcwd()
+    previous_store = newfd.history_store
+    try:
+        os.chdir(workdir)
+        newfd.history_store = HistoryStore(newfd.SCORES_HISTORY_FILE, newfd.LEGACY_SCORES_HISTORY_FILE)
+        yield workdir
+    finally:
+        newfd.history_store = previous_store
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+@contextlib.contextmanager
+def fake_environment(profile):
+    """
+    Points the engine at the fakes and runs it in a throwaway working directory, so stores,
+    caches and output files never touch the real ones. Response caches are disabled so every
+    stage exercises its full path. Yields the (model, server) pair.
+    """
+    import scraper
+    import llm_client
+    import social_media_agent
+    import telegram_publisher
+
+    with scratch_workdir():
+        server = FakeHttpServer(profile).start()
+        model = FakeGeminiModel(profile)
+        FakeSearchClient.profile = profile
+        FakeSearchClient.image_base = server.url
+        patches = [
+            (scraper, "GoogleSearch", FakeSearchClient),
+            (scraper, "SERPAPI_API_KEY", "bench"),
+            (scraper, "SERPAPI_CACHE_ENABLED", False),
+            (scraper, "_serpapi_limiter", scraper.RateLimiter(0)),
+            (llm_client, "configure", lambda api_key=None: True),
+            (llm_client, "get_model", lambda model_name=llm_client.DEFAULT_MODEL: model),
+            (llm_client, "LLM_CACHE_ENABLED", False),
+            (llm_client, "LLM_BACKOFF_BASE_SECONDS", 0.01),
+            (telegram_publisher, "TELEGRAM_BACKOFF_BASE_SECONDS", 0.01),
+            (social_media_agent, "TELEGRAM_BOT_TOKEN", "bench-token"),
+            (social_media_agent, "TELEGRAM_CHAT_ID", "bench-chat"),
+            (social_media_agent, "_publisher", None),
+        ]
+        originals = [(obj, name, getattr(obj, name)) for obj, name, _ in patches]
+        try:
+            for obj, name, value in patches:
+                setattr(obj, name, value)
+            social_media_agent._publisher = telegram_publisher.TelegramPublisher(
+                "bench-token", "bench-chat", api_base=server.url
+            )
+            social_media_agent._publisher.start()
+            yield model, server
+        finally:
+            if social_media_agent._publisher:
+                social_media_agent._publisher.stop()
+            for obj, name, value in originals:
+                setattr(obj, name, value)
+            server.stop()
+
+# ----------------- MEASUREMENT -----------------
+def _rss_kb():
+    """Process resident-set high-water mark in KiB (None where `resource` is unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024, 1) if sys.platform == "darwin" else peak
+
+def _measure(label, fn, unit="items"):
+    """
+    Runs fn() (which returns the number of items it processed) and reports wall time, throughput,
+    the process RSS high-water mark and, while tracemalloc is tracing, the stage's peak Python allocations.
+    """
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    items = fn() or 0
+    elapsed = time.perf_counter() - start
+    result = {"seconds": round(elapsed, 4), "items": items,
+              "per_sec": round(items / elapsed, 2) if elapsed else 0.0, "rss_kb": _rss_kb()}
+    memory = f"RSS high-water {result['rss_kb'] or 0:,.0f} KiB"
+    if tracing:
+        result["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        memory += f", peak {result['peak_kb']:,.0f} KiB allocated"
+    print(f"  -> {label}: {items} {unit} in {elapsed * 1000:.1f} ms ({result['per_sec']:,.1f} {unit}/sec, {memory})")
+    return result
+
+def _throughput(label, n, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  -> {label}: {n} candidates in {elapsed * 1000:.1f} ms ({n / elapsed:,.0f} candidates/sec)")
+    return n / elapsed
+
+# ----------------- BENCHMARKS -----------------
+def bench_scoring(candidates=2000, words=900):
+    """Throughput of the heuristic scorer at blog length: per-call evaluation vs the batch API."""
+    print(f"--- BENCHMARK: heuristic scoring ({candidates} candidates, ~{words} words each) ---")
+    texts = [make_blog_text(words, seed=i) for i in range(candidates)]
+    results = {}
+    with scratch_workdir():
+        results["evaluate_blog_ai"] = _throughput("newfd.evaluate_blog_ai (one at a time)", candidates,
+                                                  lambda: [newfd.evaluate_blog_ai("Title", t, theme="bench") for t in texts])
+        results["score_batch"] = _throughput("newfd.score_batch", candidates,
+                                             lambda: newfd.score_batch(texts, "blog", theme="bench"))
+        results["extract_features"] = _throughput("newfd.extract_features only", candidates,
+                                                  lambda: [newfd.extract_features(t) for t in texts])
+    return {name: {"per_sec": round(rate, 2)} for name, rate in results.items()}
+
+def bench_pipeline(profile, themes=8, drafts=5, posts=10, batch=3, workers=3, trace_memory=False):
+    """
+    Per-stage and end-to-end timings of the engine against the fake SerpApi, Gemini and Telegram.
+    Stages: scrape, analysis, generation, feedback (blog loop), save, publish and main.run_content_engine.
+    trace_memory adds per-stage peak allocations via tracemalloc, which slows CPU-bound stages several times.
+    """
+    import main
+    import scraper
+    import analysis
+    import generator_agent
+    import social_media_agent
+
+    print(f"--- BENCHMARK: pipeline (latency {profile.latency * 1000:.0f} ms, failure rate {profile.failure_rate:.0%}, "
+          f"{themes} search themes x {profile.articles_per_theme} articles) ---")
+    random.seed(profile.seed)
+    search_themes = [f"{t} kenya" for t in _THEMES[:themes]]
+    results = {}
+    with fake_environment(profile) as (model, server):
+        state = {}
+
+        def scrape():
+            state["articles"] = scraper.get_google_news_articles(search_themes, main.START_DATE, main.END_DATE) or []
+            return len(state["articles"])
+
+        def analyze():
+            state["themes"] = analysis.find_highest_discussed_themes(state["articles"]) or list(_THEMES)
+            return len(state["articles"])
+
+        def generate():
+            return sum(1 for _ in range(drafts)
+                       if generator_agent.generate_themed_blog_post(state["themes"][0], state["articles"])[1])
+
+        def feedback_loop():
+            blog = main.generate_accepted_blog(state["themes"][0], state["articles"])
+            state["blog"] = blog
+            return blog["attempts"] if blog else 0
+
+        def save():
+            blog = state["blog"] or {"title": "Bench", "post": make_blog_text(profile.words), "scores": {}}
+            for i in range(posts):
+                main.create_markdown_file(f"{blog['title']} {i}", "https://img.example/a.jpg", blog["post"], blog["scores"])
+            return posts
+
+        def publish():
+            sent_before = server.sent
+            for i in range(posts):
+                social_media_agent.post_to_telegram(f"Bench post {i}")
+            social_media_agent.flush_telegram_outbox(60)
+            return server.sent - sent_before
+
+        def engine():
+            main.run_content_engine(batch_size=batch, workers=workers)
+            return batch
+
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            stages = [("scrape", scrape, "articles"), ("analysis", analyze, "articles"), ("generation", generate, "drafts"),
+                      ("feedback", feedback_loop, "attempts"), ("save", save, "files"), ("publish", publish, "messages"),
+                      ("engine", engine, "themes")]
+            measured = []
+            for name, fn, unit in stages:
+                print(f"\n[BENCH] Stage: {name}")
+                measured.append((name, _measure(name, fn, unit), unit))
+            results = {name: result for name, result, _ in measured}
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+        print(f"\n[BENCH] Fake Gemini calls: {model.calls}, Telegram messages delivered: {server.sent}")
+
+    print("\n--- PIPELINE SUMMARY ---")
+    for name, result, unit in measured:
+        peak = f"  peak {result['peak_kb']:>9,.0f} KiB" if "peak_kb" in result else ""
+        print(f"  {name:<11} {result['seconds'] * 1000:>9.1f} ms  {result['per_sec']:>10,.1f} {unit}/sec  "
+              f"RSS {result['rss_kb'] or 0:>9,.0f} KiB{peak}")
+    return results
+
+# ----------------- BASELINES -----------------
+def load_baselines(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_baseline(suite, results, config, path=BASELINE_FILE):
+    baselines = load_baselines(path)
+    baselines[suite] = {"config": config, "results": results, "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2)
+    os.replace(tmp_path, path)
+    print(f"[INFO] Benchmark: Baseline for '{suite}' saved to '{path}'.")
+
+def check_against_baseline(suite, results, config, tolerance=DEFAULT_TOLERANCE, path=BASELINE_FILE):
+    """
+    Compares results with the stored baseline: slower (seconds), lower throughput (per_sec) or
+    higher memory (rss_kb, peak_kb) beyond `tolerance` counts as a regression. Returns the regressions.
+    """
+    baseline = load_baselines(path).get(suite)
+    if not baseline:
+        print(f"[WARNING] Benchmark: No baseline for '{suite}' in '{path}'; run with --save-baseline first.")
+        return []
+    if baseline.get("config") != config:
+        print(f"[WARNING] Benchmark: Baseline for '{suite}' was recorded with a different configuration; skipping the check.")
+        return []
+    regressions = []
+    for stage, current in results.items():
+        previous = baseline["results"].get(stage) or {}
+        timed = previous.get("seconds") is None or previous["seconds"] >= MIN_COMPARABLE_SECONDS
+        for metric, worse_when_higher in (("seconds", True), ("rss_kb", True), ("peak_kb", True), ("per_sec", False)):
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None or (metric in ("seconds", "per_sec") and not timed):
+                continue
+            ratio = new / old
+            if (worse_when_higher and ratio > 1 + tolerance) or (not worse_when_higher and ratio < 1 - tolerance):
+                regressions.append(f"{stage}.{metric}: {old} -> {new} ({ratio - 1:+.0%})")
+    if regressions:
+        print(f"[ERROR] Benchmark: {len(regressions)} regression(s) vs baseline for '{suite}':")
+        for line in regressions:
+            print(f"  - {line}")
+    else:
+        print(f"[SUCCESS] Benchmark: '{suite}' is within {tolerance:.0%} of its baseline.")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Content engine benchmarks")
+    parser.add_argument("suite", nargs="?", default="scoring", choices=["scoring", "pipeline"])
+    parser.add_argument("--candidates", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=900)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Pipeline: latency of each fake API call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Pipeline: fraction of fake API calls that fail")
+    parser.add_argument("--articles", type=int, default=20, help="Pipeline: articles returned per search theme")
+    parser.add_argument("--themes", type=int, default=8, help="Pipeline: number of search themes scraped")
+    parser.add_argument("--drafts", type=int, default=5, help="Pipeline: drafts generated in the generation stage")
+    parser.add_argument("--posts", type=int, default=10, help="Pipeline: files saved / messages published")
+    parser.add_argument("--batch", type=int, default=3, help="Pipeline: themes written by the end-to-end run")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Pipeline: also record per-stage peak allocations (tracemalloc; inflates timings)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Store the results in {BASELINE_FILE}")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when a stage regressed vs the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    if args.suite == "scoring":
+        config = {"candidates": args.candidates, "words": args.words}
+        results = bench_scoring(args.candidates, args.words)
+    else:
+        profile = FakeProfile(latency=args.latency_ms / 1000.0, failure_rate=args.failure_rate,
+                              articles_per_theme=args.articles, words=args.words, seed=args.seed)
+        config = dict(profile.as_dict(), themes=args.themes, drafts=args.drafts, posts=args.posts,
+                      batch=args.batch, workers=args.workers, trace_memory=args.trace_memory)
+        results = bench_pipeline(profile, args.themes, args.drafts, args.posts, args.batch, args.workers,
+                                 args.trace_memory)
+
+    regressions = check_against_baseline(args.suite, results, config, args.tolerance) if args.check else []
+    if args.save_baseline:
+        save_baseline(args.suite, results, config)
+    sys.exit(1 if regressions else 0)
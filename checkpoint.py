@@ -0,0 +1,113 @@
+# checkpoint.py
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+# ----------------- CONFIG -----------------
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "runs")
+CHECKPOINT_KEEP_RUNS = int(os.getenv("CHECKPOINT_KEEP_RUNS", "20"))  # Completed run directories kept on disk
+RUN_FILE = "run.json"  # Written by mark(); marks a directory as a run
+
+def _slug(text):
+    slug = re.sub(r"[^a-z0-9]+", "-", (text or "").lower()).strip("-")
+    return slug[:80] or "theme"
+
+def _write_json(path, value):
+    """Writes JSON through a temp file and rename, so a crash never leaves a half-written checkpoint."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# ----------------- CHECKPOINTS -----------------
+class RunCheckpoint:
+    """
+    Stage outputs of one engine run, one JSON file per stage under CHECKPOINT_DIR/<run_id>/.
+    Per-theme stages live in a sub-directory per theme (see for_theme). A resumed run loads the
+    stages that completed and only recomputes the rest.
+    """
+    def __init__(self, run_id, base_dir=None):
+        self.run_id = run_id
+        self.path = os.path.join(base_dir or CHECKPOINT_DIR, run_id)
+        os.makedirs(self.path, exist_ok=True)
+
+    def _stage_path(self, stage):
+        return os.path.join(self.path, f"{stage}.json")
+
+    def has(self, stage):
+        return os.path.exists(self._stage_path(stage))
+
+    def load(self, stage, default=None):
+        """The checkpointed value of `stage`, or `default` when it has not completed (or is unreadable)."""
+        path = self._stage_path(stage)
+        if not os.path.exists(path):
+            return default
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)["value"]
+        except Exception as e:
+            print(f"  -> [WARNING] Checkpoint: Ignoring unreadable checkpoint '{path}'. Error: {e}")
+            return default
+
+    def save(self, stage, value):
+        """Records `stage` as completed with its output. Failures are logged, never raised."""
+        try:
+            _write_json(self._stage_path(stage), {"stage": stage, "saved_at": time.time(), "value": value})
+        except Exception as e:
+            print(f"  -> [WARNING] Checkpoint: Could not save stage '{stage}'. Error: {e}")
+
+    def for_theme(self, theme):
+        """Checkpoint for one theme's pipeline stages (image, blog, blog_feedback, social, social_feedback, saved, published)."""
+        return RunCheckpoint(os.path.join("themes", _slug(theme)), base_dir=self.path)
+
+    # ----------------- Run status -----------------
+    def status(self):
+        return self.load("run", {}).get("status")
+
+    def mark(self, status):
+        info = self.load("run", {}) or {}
+        info.setdefault("started_at", time.time())
+        info.update(status=status, updated_at=time.time())
+        self.save("run", info)
+
+def start(run_id, base_dir=None):
+    """Creates the checkpoint directory for a new run."""
+    run = RunCheckpoint(run_id, base_dir)
+    run.mark("running")
+    prune(base_dir)
+    return run
+
+def resume(run_id=None, base_dir=None):
+    """
+    Reopens a previous run: `run_id`, or the most recent run that did not complete.
+    Returns None when there is nothing to resume.
+    """
+    base_dir = base_dir or CHECKPOINT_DIR
+    if run_id:
+        if not os.path.isfile(os.path.join(base_dir, run_id, RUN_FILE)):
+            return None
+        return RunCheckpoint(run_id, base_dir)
+    for candidate in reversed(_run_ids(base_dir)):
+        run = RunCheckpoint(candidate, base_dir)
+        if run.status() != "complete":
+            return run
+    return None
+
+def _run_ids(base_dir):
+    """Run directories, oldest first (run ids start with their start timestamp, see telemetry.Telemetry.reset)."""
+    if not os.path.isdir(base_dir):
+        return []
+    return sorted(name for name in os.listdir(base_dir) if os.path.isfile(os.path.join(base_dir, name, RUN_FILE)))
+
+def prune(base_dir=None, keep=None):
+    """Deletes the oldest completed runs beyond `keep`; incomplete runs are kept for --resume."""
+    base_dir = base_dir or CHECKPOINT_DIR
+    keep = CHECKPOINT_KEEP_RUNS if keep is None else keep
+    completed = [r for r in _run_ids(base_dir) if RunCheckpoint(r, base_dir).status() == "complete"]
+    for run_id in completed[:max(len(completed) - keep, 0)]:
+        shutil.rmtree(os.path.join(base_dir, run_id), ignore_errors=True)
@@ -0,0 +1,106 @@
+# dedup.py
+import re
+import zlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# ----------------- CONFIG -----------------
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid",
+    "ref", "ref_src", "cmpid", "ocid", "ito", "_ga", "amp", "outputtype",
+}
+NEAR_DUPLICATE_THRESHOLD = 0.8   # Estimated Jaccard similarity above which two articles are collapsed
+SHINGLE_SIZE = 3                 # Words per shingle
+NUM_PERMUTATIONS = 64            # MinHash signature length
+LSH_BANDS = 16                   # Bands x rows must equal NUM_PERMUTATIONS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed coefficients so signatures are stable across runs
+_PERMUTATIONS = [((i * 0x9E3779B1 + 1) % _MERSENNE_PRIME, (i * 0x85EBCA77 + 7) % _MERSENNE_PRIME) for i in range(1, NUM_PERMUTATIONS + 1)]
+
+# ----------------- URL CANONICALIZATION -----------------
+def canonical_url(url):
+    """
+    Normalizes an article URL so syndicated/AMP/tracked variants compare equal:
+    lowercases scheme and host, drops "www."/"amp." prefixes, tracking params, fragments,
+    AMP path markers and trailing slashes.
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    for prefix in ("www.", "amp.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+
+    path = parts.path or "/"
+    path = re.sub(r"/amp(?=/|$)", "", path)
+    path = re.sub(r"\.amp(?=\.html?$|$)", "", path)
+    path = path.rstrip("/") or "/"
+
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    query.sort()
+    return urlunsplit(("https" if parts.scheme in ("http", "https", "") else parts.scheme, host, path, urlencode(query), ""))
+
+# ----------------- NEAR-DUPLICATE DETECTION -----------------
+def _shingles(text, size=SHINGLE_SIZE):
+    words = re.findall(r"[a-z0-9]+", (text or "").lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def minhash_signature(text):
+    """Returns the MinHash signature (list of ints) of the text's word shingles."""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in _shingles(text)]
+    if not hashes:
+        return None
+    return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS]
+
+def estimated_similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+# ----------------- PUBLIC API -----------------
+def dedupe_articles(articles, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Collapses exact (canonical URL) and near-duplicate (MinHash over title + summary) articles.
+    The first occurrence is kept, so input order (theme priority) decides the survivor.
+    Returns: (unique_articles, {"url_duplicates": n, "near_duplicates": m})
+    """
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    seen_urls = set()
+    buckets = {}      # (band index, band values) -> indices into `unique`
+    signatures = []   # parallel to `unique`
+    unique = []
+    report = {"url_duplicates": 0, "near_duplicates": 0}
+
+    for article in articles:
+        url_key = canonical_url(article.get("link", ""))
+        if url_key and url_key in seen_urls:
+            report["url_duplicates"] += 1
+            continue
+
+        signature = minhash_signature(f"{article.get('title', '')} {article.get('summary', '')}")
+        band_keys = []
+        is_duplicate = False
+        if signature is not None:
+            band_keys = [(b, tuple(signature[b * rows:(b + 1) * rows])) for b in range(LSH_BANDS)]
+            candidates = {idx for key in band_keys for idx in buckets.get(key, ())}
+            is_duplicate = any(estimated_similarity(signature, signatures[idx]) >= threshold for idx in candidates)
+        if is_duplicate:
+            report["near_duplicates"] += 1
+            if url_key:
+                seen_urls.add(url_key)
+            continue
+
+        if url_key:
+            seen_urls.add(url_key)
+        for key in band_keys:
+            buckets.setdefault(key, []).append(len(unique))
+        signatures.append(signature)
+        unique.append(article)
+
+    return unique, report
@@ -1,65 +1,71 @@
 # feedback_memory.py
-import json
-import os
-from datetime import datetime
+import threading
+from collections import deque
+from itertools import islice
 
-class FeedbackMemory:
-    def __init__(self, history_file="feedback_history.json"):
-        self.blog_tips = []
-        self.social_tips = []
-        self.history_file = history_file
-        self.history = []
-        self._load_history()
+import feedback
 
-    def _load_history(self):
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, "r", encoding="utf-8") as f:
-                    self.history = json.load(f)
-            except Exception:
-                self.history = []
+TIP_BUFFER_SIZE = 20     # Tips kept per (kind, success/warning); older ones fall off
+TIPS_RETURNED = 3        # Tips handed to the next prompt
+SUCCESS_THRESHOLD = 0.80
 
-    def _save_history(self):
-        try:
-            with open(self.history_file, "w", encoding="utf-8") as f:
-                json.dump(self.history, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"[ERROR] FeedbackMemory: Failed to save history. {e}")
+class FeedbackMemory:
+    """
+    Recent improvement tips and success patterns per content type. The history itself is written
+    only by feedback.record_feedback; the memory reads that store (once, to seed its buffers)
+    and is kept current through add_tips.
+    """
+    def __init__(self, store=None):
+        # Nothing is read from disk until the memory is first used
+        self._store = store
+        self._tips = None
+        self._lock = threading.Lock()
 
-    def add_feedback(self, kind, title, theme, scores, reasoning, attempt, accepted=False):
-        record = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "type": kind,
-            "title": title,
-            "theme": theme,
-            "scores": scores,
-            "reasoning": reasoning,
-            "attempt": attempt,
-            "accepted": accepted
-        }
-        self.history.append(record)
-        self._save_history()
+    def _ensure_loaded(self):
+        """Lazily opens the history store and seeds the tip buffers from its most recent entries."""
+        if self._tips is not None:
+            return
+        with self._lock:
+            if self._tips is not None:
+                return
+            if self._store is None:
+                self._store = feedback.history_store
+            tips = {
+                (kind, status): deque(maxlen=TIP_BUFFER_SIZE)
+                for kind in ("blog", "social") for status in ("success", "warning")
+            }
+            for record in self._store.tail(TIP_BUFFER_SIZE * 4):
+                self._add_tip(tips, record.get("type"), record.get("reasoning"), record.get("scores") or {})
+            self._tips = tips
 
+    @staticmethod
+    def _add_tip(tips, kind, reasoning, scores):
         # reinforcement: separate successes and improvement tips
+        if kind not in ("blog", "social") or not reasoning:
+            return
         overall = scores.get("overall", 0)
         tip = f"{reasoning} (score={overall})"
-        if overall >= 0.80:
-            if kind == "blog":
-                self.blog_tips.append(f"✅ {tip}")
-            elif kind == "social":
-                self.social_tips.append(f"✅ {tip}")
+        if overall >= SUCCESS_THRESHOLD:
+            tips[(kind, "success")].append(f"✅ {tip}")
         else:
-            if kind == "blog":
-                self.blog_tips.append(f"⚠️ {tip}")
-            elif kind == "social":
-                self.social_tips.append(f"⚠️ {tip}")
+            tips[(kind, "warning")].append(f"⚠️ {tip}")
+
+    def add_tips(self, kind, reasoning, scores):
+        """Adds one evaluation to the tip buffers (the history record is written by feedback.record_feedback)."""
+        self._ensure_loaded()
+        with self._lock:
+            self._add_tip(self._tips, kind, reasoning, scores or {})
+
+    def _latest(self, kind, status):
+        self._ensure_loaded()
+        buffer = self._tips.get((kind, status)) or ()
+        # Newest TIPS_RETURNED tips, oldest first; touches at most TIPS_RETURNED items
+        return " ".join(reversed(list(islice(reversed(buffer), TIPS_RETURNED))))
 
     def get_improvement_tips(self, kind="blog"):
-        tips = self.blog_tips if kind == "blog" else self.social_tips
-        return " ".join([t for t in tips if t.startswith("⚠️")][-3:])
+        return self._latest("blog" if kind == "blog" else "social", "warning")
 
     def get_success_patterns(self, kind="blog"):
-        tips = self.blog_tips if kind == "blog" else self.social_tips
-        return " ".join([t for t in tips if t.startswith("✅")][-3:])
+        return self._latest("blog" if kind == "blog" else "social", "success")
 
 FeedbackMemorySingleton = FeedbackMemory()
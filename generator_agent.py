@@ -1,7 +1,22 @@
-import google.generativeai as genai
 import re
 import os
+from contextlib import closing
 from feedback_memory import FeedbackMemorySingleton
+from prompt_builder import build_articles_block
+import llm_client
+import telemetry
+
+# Token budget for the whole blog-generation prompt (instructions + tips + articles)
+GENERATION_PROMPT_TOKEN_BUDGET = int(os.getenv("GENERATION_PROMPT_TOKEN_BUDGET", "8000"))
+
+# Streaming generation: read the completion incrementally and abort drafts that break the format
+BLOG_STREAMING = os.getenv("BLOG_STREAMING", "1") != "0"
+STREAM_TITLE_WINDOW_CHARS = 300   # "Title:" must appear within this many characters
+STREAM_BODY_WINDOW_CHARS = 400    # "Blog Post:" must follow the title line within this many characters
+
+TITLE_PATTERN = re.compile(r"(?:\*{0,2}Title\*{0,2}\s*[:\-]\s*)(.+)", re.IGNORECASE)
+BLOG_PATTERN = re.compile(r"(?:\*{0,2}Blog Post\*{0,2}\s*[:\-]\s*)(.+)", re.IGNORECASE | re.DOTALL)
+BLOG_MARKER_PATTERN = re.compile(r"\*{0,2}Blog Post\*{0,2}\s*[:\-]", re.IGNORECASE)
 
 BLOG_GENERATION_PROMPT = """
 You are an expert real estate content creator and market analyst for a Kenyan audience.
@@ -28,44 +43,89 @@ Source Articles:
 ---
 """
 
-def generate_themed_blog_post(theme, articles):
+def _parse_blog_output(raw_text, theme):
+    title_match = TITLE_PATTERN.search(raw_text)
+    blog_match = BLOG_PATTERN.search(raw_text)
+
+    title = title_match.group(1).strip() if title_match else f"Insights on {theme}"
+    blog_post = blog_match.group(1).strip() if blog_match else raw_text
+    return title, blog_post
+
+def _stream_blog_text(prompt, model_name, on_title=None):
+    """
+    Streams the completion and validates the "Title: / Blog Post:" structure as it arrives.
+    Calls on_title(title) as soon as the title line is complete. Returns the full text, or None
+    when the draft was cancelled early for breaking the required format.
+    """
+    buffer = ""
+    title = None
+    title_end = None
+    with closing(llm_client.generate_stream(prompt, model_name=model_name)) as stream:
+        for chunk in stream:
+            buffer += chunk
+            if title is None:
+                match = TITLE_PATTERN.search(buffer)
+                if match and "\n" in buffer[match.end(1):]:
+                    title, title_end = match.group(1).strip(), match.end(1)
+                    if on_title:
+                        on_title(title)
+                elif not match and len(buffer.lstrip()) > STREAM_TITLE_WINDOW_CHARS:
+                    print("  -> [WARNING] Generator Agent: No 'Title:' in streamed output; cancelling draft.")
+                    return None
+            elif not BLOG_MARKER_PATTERN.search(buffer, title_end) and len(buffer) - title_end > STREAM_BODY_WINDOW_CHARS:
+                print("  -> [WARNING] Generator Agent: No 'Blog Post:' after the title; cancelling draft.")
+                return None
+    return buffer.strip()
+
+def generate_themed_blog_post(theme, articles, stream=None, on_title=None):
     """
     Generate a blog post for a given theme and list of article dicts.
-    articles: List of dicts with 'title' and 'summary' keys.
+    articles: List of dicts with 'title' and 'summary' keys (and optionally 'body', the full text).
+    stream: read the completion incrementally (default BLOG_STREAMING); drafts that break the
+    required format are cancelled early and return (None, None). on_title is called with the
+    title as soon as it has streamed in.
     Returns: (title, blog_post_text)
     """
     if not theme:
         print("  -> [ERROR] Generator Agent: No theme provided.")
         return None, None
 
-    # Format source articles
+    # ✅ Get improvement tips from memory 
+    improvement_tips = FeedbackMemorySingleton.get_improvement_tips(kind="blog")
+
+    # Format source articles within the prompt token budget
     if articles:
-        articles_text = "\n".join([f"Title: {a.get('title','')}\nSummary: {a.get('summary','')}\n" for a in articles])
+        reserved = BLOG_GENERATION_PROMPT.format(theme=theme, articles_text="", improvement_tips=improvement_tips)
+        # Articles enriched with full text (see article_fetcher.py) contribute their body as well
+        has_bodies = any(a.get("body") for a in articles)
+        articles_text, _ = build_articles_block(
+            articles, GENERATION_PROMPT_TOKEN_BUDGET, reserved_text=reserved, label="Blog generation",
+            item_format="Title: {title}\nSummary: {summary}\nText: {body}\n" if has_bodies else "Title: {title}\nSummary: {summary}\n"
+        )
     else:
         articles_text = "No recent articles available. Use general insights about the Kenyan real estate market."
 
-    # ✅ Get improvement tips from memory 
-    improvement_tips = FeedbackMemorySingleton.get_improvement_tips(kind="blog")
-
     try:
         model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-        model = genai.GenerativeModel(model_name)
         prompt = BLOG_GENERATION_PROMPT.format(
             theme=theme,
             articles_text=articles_text,
             improvement_tips=improvement_tips
         )
-        response = model.generate_content(prompt)
-        raw_text = getattr(response, "text", "") or ""
-        raw_text = raw_text.strip()
-
-        title_match = re.search(r"(?:\*{0,2}Title\*{0,2}\s*[:\-]\s*)(.+)", raw_text, re.IGNORECASE)
-        blog_match = re.search(r"(?:\*{0,2}Blog Post\*{0,2}\s*[:\-]\s*)(.+)", raw_text, re.IGNORECASE | re.DOTALL)
-
-        title = title_match.group(1).strip() if title_match else f"Insights on {theme}"
-        blog_post = blog_match.group(1).strip() if blog_match else raw_text
+        use_stream = BLOG_STREAMING if stream is None else stream
+        with telemetry.span("generator.blog_draft", theme=theme, stream=use_stream) as span:
+            if use_stream:
+                raw_text = _stream_blog_text(prompt, model_name, on_title=on_title)
+                if raw_text is None:
+                    span["cancelled"] = True
+                    telemetry.incr("drafts_cancelled", type="blog")
+                    return None, None
+            else:
+                # Each attempt in the feedback loop must produce a fresh draft, so skip the response cache
+                raw_text = llm_client.generate(prompt, model_name=model_name, use_cache=False)
+            telemetry.incr("drafts_generated", type="blog")
 
-        return title, blog_post
+        return _parse_blog_output(raw_text, theme)
 
     except Exception as e:
         print(f"  -> [ERROR] Generator Agent: Error during blog generation. Error: {e}")
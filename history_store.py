@@ -0,0 +1,139 @@
+# history_store.py
+import json
+import os
+import threading
+
+HISTORY_FILE = "feedback_history.jsonl"
+LEGACY_HISTORY_FILE = "feedback_history.json"
+
+class HistoryStore:
+    """
+    Append-only JSONL feedback history with an in-memory index keyed by (theme, type).
+    The index keeps the entry count and the best-scoring entry per key, so lookups and
+    appends are O(1). Lines appended by other processes are picked up on the next lookup.
+    """
+    def __init__(self, path=HISTORY_FILE, legacy_path=LEGACY_HISTORY_FILE):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._index = {}
+        self._offset = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    # ----------------- Loading -----------------
+    def _migrate_legacy(self):
+        """One-time conversion of the old feedback_history.json array into JSONL."""
+        if os.path.exists(self.path) or not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                raw = f.read().strip()
+            entries = json.loads(raw) if raw else []
+        except Exception as e:
+            print(f"[ERROR] HistoryStore: Could not read legacy history '{self.legacy_path}'. {e}")
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        print(f"[INFO] HistoryStore: Migrated {len(entries)} entries from '{self.legacy_path}' to '{self.path}'.")
+
+    def _index_entry(self, entry):
+        key = (entry.get("theme"), entry.get("type"))
+        slot = self._index.get(key)
+        overall = (entry.get("scores") or {}).get("overall", 0) or 0
+        if slot is None:
+            self._index[key] = {"count": 1, "best": entry, "best_overall": overall}
+        else:
+            slot["count"] += 1
+            if overall > slot["best_overall"]:
+                slot["best"] = entry
+                slot["best_overall"] = overall
+
+    def _refresh(self):
+        """Indexes any lines appended since the last read (by this or another process)."""
+        if not self._loaded:
+            self._migrate_legacy()
+            self._loaded = True
+        try:
+            if os.path.getsize(self.path) <= self._offset:
+                return
+        except OSError:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # Partial line still being written; pick it up next time
+                self._offset += len(raw)
+                try:
+                    self._index_entry(json.loads(raw))
+                except (ValueError, AttributeError):
+                    continue
+
+    # ----------------- Public API -----------------
+    def append(self, entry):
+        """Appends one entry as a single JSONL line and indexes it."""
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if not self._loaded:
+                self._refresh()
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+            self._refresh()
+
+    def best(self, theme, content_type):
+        """Best-scoring past entry for (theme, type), or None."""
+        with self._lock:
+            self._refresh()
+            slot = self._index.get((theme, content_type))
+            return slot["best"] if slot else None
+
+    def count(self, theme, content_type):
+        with self._lock:
+            self._refresh()
+            slot = self._index.get((theme, content_type))
+            return slot["count"] if slot else 0
+
+    def tail(self, max_entries, max_bytes=64 * 1024):
+        """Last `max_entries` entries, read from at most the final `max_bytes` of the file."""
+        with self._lock:
+            if not self._loaded:
+                self._migrate_legacy()
+                self._loaded = True
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                f.seek(max(size - max_bytes, 0))
+                lines = f.read().splitlines()
+        except OSError:
+            return []
+        if size > max_bytes:
+            lines = lines[1:]  # First line is probably cut mid-record
+        entries = []
+        for raw in lines[-max_entries:]:
+            try:
+                entries.append(json.loads(raw))
+            except ValueError:
+                continue
+        return entries
+
+    def iter_entries(self):
+        """Streams every stored entry from disk (for reporting; not used on the hot path)."""
+        with self._lock:
+            self._refresh()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
@@ -0,0 +1,120 @@
+# keyphrase.py
+import math
+import re
+
+# ----------------- CONFIG -----------------
+MIN_NGRAM = 2
+MAX_NGRAM = 6
+MIN_DOC_FREQ = 2   # A theme must appear in at least this many articles (relaxed for tiny corpora)
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "been", "but", "by", "can", "could", "did", "do", "does",
+    "for", "from", "had", "has", "have", "he", "her", "his", "how", "i", "if", "in", "into", "is", "it",
+    "its", "more", "most", "new", "no", "not", "of", "on", "or", "our", "over", "said", "says", "she",
+    "so", "than", "that", "the", "their", "them", "there", "these", "they", "this", "to", "up", "was",
+    "we", "were", "what", "when", "which", "while", "who", "will", "with", "would", "you", "your",
+    "after", "about", "amid", "also", "all", "any", "just", "out", "per", "via", "year", "years",
+    "week", "month", "today", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+}
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9'\-]*|[.,;:!?()\"|]")
+
+# ----------------- TOKENIZATION -----------------
+def _segments(text):
+    """Splits text into runs of words that do not cross punctuation; keeps original casing."""
+    segment = []
+    for token in _TOKEN_RE.findall(text or ""):
+        if token[0].isalnum():
+            segment.append(token)
+        elif segment:
+            yield segment
+            segment = []
+    if segment:
+        yield segment
+
+def _candidate_ngrams(text):
+    """
+    Returns {normalized n-gram: surface form} for 2-6 word phrases that neither start nor end
+    with a stopword and are not purely numeric.
+    """
+    candidates = {}
+    for words in _segments(text):
+        lowered = [w.lower() for w in words]
+        for n in range(MIN_NGRAM, MAX_NGRAM + 1):
+            for i in range(len(words) - n + 1):
+                gram = lowered[i:i + n]
+                if gram[0] in STOPWORDS or gram[-1] in STOPWORDS:
+                    continue
+                if all(w.isdigit() for w in gram):
+                    continue
+                key = " ".join(gram)
+                if key not in candidates:
+                    candidates[key] = " ".join(words[i:i + n])
+    return candidates
+
+# ----------------- RANKING -----------------
+def rank_keyphrases(articles, top_n=7):
+    """
+    Ranks 2-6 word keyphrases over article titles + summaries with n-gram TF-IDF.
+    Each article is a sparse {ngram: tf} vector; a phrase scores the sum of its TF-IDF weights
+    across articles, so phrases shared by many (but not all) articles rank highest.
+    Phrases contained in a higher-ranked phrase are skipped.
+    Returns: list of (phrase, score), best first.
+    """
+    if not articles:
+        return []
+
+    doc_vectors = []
+    doc_freq = {}
+    surface = {}
+    for a in articles:
+        text = f"{a.get('title', '')}. {a.get('summary', '')}"
+        candidates = _candidate_ngrams(text)
+        for key, form in candidates.items():
+            doc_freq[key] = doc_freq.get(key, 0) + 1
+            surface.setdefault(key, form)
+        lowered = text.lower()
+        doc_vectors.append({key: lowered.count(key) or 1 for key in candidates})
+
+    total = len(articles)
+    min_df = MIN_DOC_FREQ if total >= 2 * MIN_DOC_FREQ else 1
+    idf = {k: math.log((1 + total) / (1 + df)) + 1 for k, df in doc_freq.items() if df >= min_df}
+
+    scores = {}
+    for vector in doc_vectors:
+        for key, tf in vector.items():
+            weight = idf.get(key)
+            if weight is not None:
+                # Favour longer, more specific phrases slightly
+                scores[key] = scores.get(key, 0.0) + tf * weight * (1 + 0.15 * (key.count(" ") - 1))
+
+    ranked = []
+    for key, score in sorted(scores.items(), key=lambda kv: kv[1], reverse=True):
+        if any(key in chosen or chosen in key for chosen, _ in ranked):
+            continue
+        ranked.append((key, score))
+        if len(ranked) >= top_n:
+            break
+    return [(_display(surface[key]), round(score, 3)) for key, score in ranked]
+
+def _display(phrase):
+    return phrase[0].upper() + phrase[1:] if phrase else phrase
+
+def extract_themes(articles, top_n=7):
+    """Returns just the ranked theme phrases (same shape as analysis.find_highest_discussed_themes)."""
+    return [phrase for phrase, _ in rank_keyphrases(articles, top_n=top_n)]
+
+def select_representative_articles(articles, limit, top_n=15):
+    """
+    Pre-filter for the LLM: keeps the `limit` articles that cover the most top-ranked keyphrases,
+    preserving their original order.
+    """
+    if len(articles) <= limit:
+        return list(articles)
+    phrase_scores = {p.lower(): s for p, s in rank_keyphrases(articles, top_n=top_n)}
+    scored = []
+    for idx, a in enumerate(articles):
+        text = f"{a.get('title', '')} {a.get('summary', '')}".lower()
+        scored.append((sum(s for p, s in phrase_scores.items() if p in text), idx))
+    keep = sorted(idx for _, idx in sorted(scored, key=lambda x: (-x[0], x[1]))[:limit])
+    return [articles[idx] for idx in keep]
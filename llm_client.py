@@ -0,0 +1,207 @@
+# llm_client.py
+import os
+import random
+import threading
+import time
+
+from prompt_builder import estimate_tokens
+from response_cache import ResponseCache, make_cache_key
+import telemetry
+
+# ----------------- CONFIG -----------------
+DEFAULT_MODEL = "gemini-1.5-flash-latest"
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1.0"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+genai = None  # google.generativeai, imported on first use so CLI start-up stays fast (see _load_genai)
+_models = {}
+_models_lock = threading.Lock()
+_configured = False
+_api_key = None
+_semaphore = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+response_cache = ResponseCache(
+    path=os.getenv("LLM_CACHE_FILE", "llm_cache.db"),
+    default_ttl=LLM_CACHE_TTL_SECONDS,
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+)
+
+# ----------------- SETUP -----------------
+def _load_genai():
+    global genai
+    if genai is None:
+        import google.generativeai as genai_module
+        genai = genai_module
+    return genai
+
+def configure(api_key=None):
+    """
+    Records the Gemini API key. The SDK is imported and configured on the first model use, so
+    runs served entirely from the response cache never load it. Returns False when no key is available.
+    """
+    global _api_key, _configured
+    api_key = api_key or os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return False
+    with _models_lock:
+        if api_key != _api_key:
+            _api_key = api_key
+            _configured = False
+    return True
+
+def get_model(model_name=DEFAULT_MODEL):
+    """Returns a cached GenerativeModel instance for the model name."""
+    global _configured
+    with _models_lock:
+        if not _configured:
+            api_key = _api_key or os.getenv("GEMINI_API_KEY")
+            if api_key:
+                _load_genai().configure(api_key=api_key)
+                _configured = True
+        model = _models.get(model_name)
+        if model is None:
+            model = _load_genai().GenerativeModel(model_name)
+            _models[model_name] = model
+        return model
+
+# ----------------- GENERATION -----------------
+def _is_retryable(error):
+    """True for rate limiting (429), server errors (5xx) and timeouts."""
+    code = getattr(error, "code", None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            code = None
+    code = getattr(code, "value", code)
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    name = type(error).__name__
+    return name in {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError", "DeadlineExceeded"}
+
+def _call_with_retries(call, model_name, retries):
+    """Runs call() with exponential backoff + jitter on retryable errors; re-raises the last error."""
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except Exception as e:
+            if attempt >= retries or not _is_retryable(e):
+                telemetry.incr("api_errors", provider="gemini", model=model_name)
+                raise
+            delay = LLM_BACKOFF_BASE_SECONDS * (2 ** attempt) * (0.5 + random.random())
+            telemetry.incr("api_retries", provider="gemini", model=model_name)
+            print(f"  -> [WARNING] LLMClient: {model_name} call failed ({e}); retrying in {delay:.1f}s...")
+            time.sleep(delay)
+            attempt += 1
+
+def _count_usage(model_name, prompt, response):
+    telemetry.incr("llm_prompt_chars", len(prompt), model=model_name)
+    telemetry.incr("llm_prompt_tokens_estimated", estimate_tokens(prompt), model=model_name)
+    telemetry.incr("llm_response_chars", len(response), model=model_name)
+    telemetry.incr("llm_response_tokens_estimated", estimate_tokens(response), model=model_name)
+
+def generate(prompt, model_name=DEFAULT_MODEL, generation_config=None, timeout=None, retries=None, use_cache=True):
+    """
+    Sends a prompt through the shared gateway and returns the stripped response text.
+    Applies the process-wide concurrency limit, per-call timeout and exponential backoff with
+    jitter on 429/5xx. With use_cache (and LLM_CACHE_ENABLED), identical (model, prompt,
+    generation_config) requests are answered from the local response cache.
+    Raises the last error when all attempts fail.
+    """
+    timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    retries = LLM_MAX_RETRIES if retries is None else retries
+    cache_key = None
+    if use_cache and LLM_CACHE_ENABLED:
+        cache_key = make_cache_key({"model": model_name, "prompt": prompt, "generation_config": generation_config or {}})
+        cached = response_cache.get(model_name, cache_key)
+        if cached is not None:
+            telemetry.incr("cache_hits", cache="llm", namespace=model_name)
+            return cached
+        telemetry.incr("cache_misses", cache="llm", namespace=model_name)
+
+    model = get_model(model_name)
+
+    def call():
+        telemetry.incr("api_calls", provider="gemini", endpoint=model_name)
+        with _semaphore:
+            response = model.generate_content(
+                prompt, generation_config=generation_config, request_options={"timeout": timeout}
+            )
+        return (getattr(response, "text", "") or "").strip()
+
+    with telemetry.span("gemini.generate", model=model_name, prompt_chars=len(prompt)) as span:
+        text = _call_with_retries(call, model_name, retries)
+        span["response_chars"] = len(text)
+    _count_usage(model_name, prompt, text)
+    if cache_key and text:
+        response_cache.set(model_name, cache_key, text)
+    return text
+
+def _cancel_stream(response):
+    """
+    Best-effort cancel of an unfinished streaming response. google-generativeai keeps the gRPC
+    stream on the private `_iterator`; gRPC streams have cancel(), plain generators have close().
+    """
+    for stream in (response, getattr(response, "_iterator", None)):
+        for method in ("cancel", "close"):
+            fn = getattr(stream, method, None)
+            if callable(fn):
+                try:
+                    fn()
+                except Exception as e:
+                    print(f"  -> [WARNING] LLM: Could not {method} the response stream. Error: {e}")
+                break
+
+def generate_stream(prompt, model_name=DEFAULT_MODEL, generation_config=None, timeout=None, retries=None):
+    """
+    Streams a response as text chunks. Opening the stream is retried like generate(); errors after
+    the first chunk propagate. Closing the generator early (e.g. via contextlib.closing) releases
+    the concurrency slot and cancels the underlying SDK stream (see _cancel_stream), so the rest
+    of the completion is not downloaded. If the SDK exposes no way to cancel, the remaining chunks
+    are simply never read. Streamed responses are never cached.
+    """
+    timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    retries = LLM_MAX_RETRIES if retries is None else retries
+    model = get_model(model_name)
+
+    def open_stream():
+        # The slot is held for the whole stream, but released between retry attempts
+        _semaphore.acquire()
+        try:
+            return model.generate_content(
+                prompt, generation_config=generation_config, request_options={"timeout": timeout}, stream=True
+            )
+        except Exception:
+            _semaphore.release()
+            raise
+
+    def open_counted():
+        telemetry.incr("api_calls", provider="gemini", endpoint=model_name)
+        return open_stream()
+
+    with telemetry.span("gemini.stream", model=model_name, prompt_chars=len(prompt)) as span:
+        stream = _call_with_retries(open_counted, model_name, retries)
+        received = []
+        finished = False
+        try:
+            for chunk in stream:
+                text = getattr(chunk, "text", "") or ""
+                if text:
+                    received.append(text)
+                    yield text
+            finished = True
+        finally:
+            if not finished:
+                _cancel_stream(stream)
+            _semaphore.release()
+            response = "".join(received)
+            span["response_chars"] = len(response)
+            _count_usage(model_name, prompt, response)
@@ -1,7 +1,14 @@
 # main.py
 import os
-import re
+import argparse
 import asyncio
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
@@ -9,6 +16,13 @@ import scraper
 import analysis
 import generator_agent
 import social_media_agent
+import article_store
+import article_fetcher
+import checkpoint
+import output_store
+import work_queue
+import theme_index
+import telemetry
 import feedback   # Feedback scoring + AI evaluation + record_feedback
 from feedback_memory import FeedbackMemorySingleton  # Use singleton memory
 
@@ -26,15 +40,46 @@ INITIAL_SEARCH_THEMES = [
     "Kenya land prices"
 ]
 SITE_TARGET = None
+INCREMENTAL_SCRAPING = True  # Fetch only the delta since each theme's watermark (see article_store.py)
+FULLTEXT_ENRICHMENT = article_fetcher.FULLTEXT_ENABLED  # Fetch article bodies after scraping (see article_fetcher.py)
 
 PROCESSED_BLOG_THEMES_LOG = "processed_blog_themes.log"
+OUTPUT_DIR = output_store.OUTPUT_DIR  # Blog and social Markdown files plus their manifest (see output_store.py)
 CURRENT_SEARCH_THEMES_LOG = "current_search_themes.log"
 
-END_DATE = datetime.today().strftime("%Y-%m-%d")
-START_DATE = (datetime.today() - timedelta(days=30)).strftime("%Y-%m-%d")
+LOOKBACK_DAYS = 30
+
+def _date_window():
+    today = datetime.today()
+    return (today - timedelta(days=LOOKBACK_DAYS)).strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d")
+
+START_DATE, END_DATE = _date_window()
 
 FEEDBACK_SCORE_THRESHOLD = 0.80  # Stop feedback loop when score ≥ 0.80
 MAX_ATTEMPTS = 15  # Increased max attempts for reinforcement
+BLOG_SPECULATIVE_CANDIDATES = int(os.getenv("BLOG_SPECULATIVE_CANDIDATES", "1"))  # Drafts generated concurrently per wave
+BLOG_LOOP_MAX_SECONDS = float(os.getenv("BLOG_LOOP_MAX_SECONDS", "600"))  # Wall-clock cap for the blog loop
+
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1"))        # Themes written per run (all share one scrape + analysis)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "3"))  # Theme pipelines run concurrently in batch mode
+
+IMAGE_PREFETCH_EXTRA_THEMES = int(os.getenv("IMAGE_PREFETCH_EXTRA_THEMES", "2"))  # Next-ranked themes whose images are warmed too
+PLACEHOLDER_IMAGE_URL = "https://via.placeholder.com/800x400.png?text=Relevant+Image"
+
+TELEGRAM_FLUSH_TIMEOUT_SECONDS = 30  # How long a run waits for queued Telegram posts before exiting
+
+DAEMON_INTERVAL_SECONDS = float(os.getenv("DAEMON_INTERVAL_SECONDS", "3600"))  # Time between run starts in --daemon mode
+
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "5"))            # How often an idle queue worker checks for tasks
+WORKER_IDLE_EXIT_SECONDS = float(os.getenv("WORKER_IDLE_EXIT_SECONDS", "60"))  # Idle time after which a worker exits (0 = never)
+QUEUE_CHECKPOINT_DIR = os.path.join(checkpoint.CHECKPOINT_DIR, "queue")       # Per-task checkpoints of queue workers
+
+_processed_log_lock = threading.Lock()
+_article_store = None
+_theme_index = None
+_output_store = None
+_work_queue = None
+_theme_index_lock = threading.Lock()
 
 # --- HELPER FUNCTIONS ---
 def load_processed_blog_themes():
@@ -45,10 +90,43 @@ def load_processed_blog_themes():
 
 def save_processed_blog_theme(theme):
     try:
-        with open(PROCESSED_BLOG_THEMES_LOG, 'a', encoding='utf-8') as f:
+        with _processed_log_lock, open(PROCESSED_BLOG_THEMES_LOG, 'a', encoding='utf-8') as f:
             f.write(theme.lower().strip() + '\n')
     except Exception as e:
         print(f"[ERROR] Main: Could not save processed theme. Error: {e}")
+    try:
+        get_theme_index().add(theme)
+    except Exception as e:
+        print(f"[ERROR] Main: Could not index processed theme. Error: {e}")
+
+def get_output_store():
+    """Output store shared by every run in this process."""
+    global _output_store
+    if _output_store is None:
+        _output_store = output_store.OutputStore(OUTPUT_DIR)
+        # Posts count as published once Telegram accepts them, not when they are queued
+        social_media_agent.add_sent_handler(_output_store.mark_published)
+    return _output_store
+
+def get_work_queue():
+    """Work queue shared by the coordinator and worker processes (see work_queue.py)."""
+    global _work_queue
+    if _work_queue is None:
+        _work_queue = work_queue.WorkQueue()
+    return _work_queue
+
+def get_theme_index():
+    """Similarity index over processed themes, seeded from the processed-themes log on first use."""
+    global _theme_index
+    with _theme_index_lock:
+        if _theme_index is None:
+            index = theme_index.ThemeIndex()
+            if not len(index):
+                imported = index.import_themes(load_processed_blog_themes())
+                if imported:
+                    print(f"[INFO] Main: Indexed {imported} previously processed themes.")
+            _theme_index = index
+        return _theme_index
 
 def load_current_search_themes():
     if not os.path.exists(CURRENT_SEARCH_THEMES_LOG):
@@ -65,201 +143,577 @@ def save_current_search_themes(themes):
     except Exception as e:
         print(f"[ERROR] Main: Could not save current search themes. Error: {e}")
 
-def create_markdown_file(title, image_url, blog_post, scores=None):
-    clean_title = title.strip().replace('\n', ' ')
-    safe_title = re.sub(r'[\\/*?:"<>|]', "", clean_title)[:120]
-    filename = f"{safe_title}.md"
-    content = f"# {title}\n\n![Blog Post Image]({image_url})\n\n{blog_post}"
-    if scores:
-        content += "\n\n---\n\n## Feedback Scores\n"
-        for k, v in scores.items():
-            content += f"- **{k.capitalize()}**: {v}\n"
+def _scores_section(scores):
+    if not scores:
+        return ""
+    section = "\n\n---\n\n## Feedback Scores\n"
+    for k, v in scores.items():
+        section += f"- **{k.capitalize()}**: {v}\n"
+    return section
+
+def create_markdown_file(title, image_url, blog_post, scores=None, theme=None):
+    """Saves the blog post to the output store. Returns its manifest entry, or None on failure."""
+    content = f"# {title}\n\n![Blog Post Image]({image_url})\n\n{blog_post}" + _scores_section(scores)
     try:
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(content)
-        print(f"[SUCCESS] Main: Blog post saved to '{filename}'")
+        post = get_output_store().save("blog", title.strip().replace('\n', ' '), content, theme=theme, scores=scores)
+        print(f"[SUCCESS] Main: Blog post saved to '{os.path.join(OUTPUT_DIR, post['path'])}'")
+        return post
     except Exception as e:
         print(f"[ERROR] Main: Failed to save Markdown file. Error: {e}")
+        return None
 
-def create_social_markdown_file(title, social_post_text, scores=None):
-    clean_title = title.strip().replace('\n', ' ')
-    safe_title = re.sub(r'[\\/*?:"<>|]', "", clean_title)[:120]
-    filename = f"{safe_title}-social.md"
-    content = f"# Social Media Post for: {title}\n\n{social_post_text}"
-    if scores:
-        content += "\n\n---\n\n## Feedback Scores\n"
-        for k, v in scores.items():
-            content += f"- **{k.capitalize()}**: {v}\n"
+def create_social_markdown_file(title, social_post_text, scores=None, theme=None):
+    """Saves the social post to the output store. Returns its manifest entry, or None on failure."""
+    content = f"# Social Media Post for: {title}\n\n{social_post_text}" + _scores_section(scores)
     try:
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(content)
-        print(f"[SUCCESS] Main: Social media post saved to '{filename}'")
+        post = get_output_store().save("social", title.strip().replace('\n', ' '), content, theme=theme, scores=scores)
+        print(f"[SUCCESS] Main: Social media post saved to '{os.path.join(OUTPUT_DIR, post['path'])}'")
+        return post
     except Exception as e:
         print(f"[ERROR] Main: Failed to save social media Markdown file. Error: {e}")
-
-# --- MAIN WORKFLOW ---
-def run_content_engine():
-    print("--- LAUNCHING CONTENT CAMPAIGN ENGINE ---")
-
-    if not analysis.configure_ai():
-        print("  -> [WARNING] Main: Gemini not configured; feedback will fall back to heuristics.")
-
-    memory = FeedbackMemorySingleton
-    current_search_themes = load_current_search_themes()
-    processed_blog_themes = load_processed_blog_themes()
-
-    # STEP 0: Expand themes if low
-    if not current_search_themes or (len(current_search_themes) < 4 and len(processed_blog_themes) > 3):
-        new_search_suggestions = analysis.discover_new_search_themes(current_search_themes, processed_blog_themes)
-        if new_search_suggestions:
-            updated = list(dict.fromkeys(current_search_themes + new_search_suggestions))
-            save_current_search_themes(updated)
-            current_search_themes = updated
-
-    # STEP 1: SCRAPE ARTICLES
-    all_articles = scraper.get_google_news_articles(
-        themes=current_search_themes, start_date=START_DATE, end_date=END_DATE, site_target=SITE_TARGET
-    )
-    if not all_articles:
-        new_search_suggestions = analysis.discover_new_search_themes(current_search_themes, processed_blog_themes)
-        if new_search_suggestions:
-            all_articles = scraper.get_google_news_articles(
-                themes=new_search_suggestions, start_date=START_DATE, end_date=END_DATE, site_target=SITE_TARGET
-            )
-
-    if not all_articles:
-        print("\n--- ENGINE SHUTDOWN: No articles found. ---")
-        return
-    print(f"[SUCCESS] Main: Found {len(all_articles)} articles.")
-
-    # STEP 2: ANALYZE THEMES
-    all_discussed_themes = analysis.find_highest_discussed_themes(all_articles)
-    if not all_discussed_themes:
-        print("\n--- ENGINE SHUTDOWN: No themes found. ---")
-        return
-    print(f"[SUCCESS] Main: Identified {len(all_discussed_themes)} themes.")
-
-    # STEP 3: PICK NEXT THEME
-    processed_lower = set(processed_blog_themes)
-    next_theme_to_write = None
+        return None
+
+def select_unprocessed_themes(all_discussed_themes, processed_blog_themes, limit, index=None):
+    """
+    Top `limit` discussed themes (in rank order) that have not been written about yet. With a
+    ThemeIndex, near-duplicates of processed themes (and of themes already selected) are skipped too.
+    """
+    seen = set(processed_blog_themes)
+    selected = []
     for theme in all_discussed_themes:
-        if theme.lower() not in processed_lower:
-            next_theme_to_write = theme
+        if theme.lower() in seen:
+            continue
+        seen.add(theme.lower())
+        if index is not None:
+            score, match = index.most_similar(theme)
+            if score >= index.threshold:
+                print(f"  -> [INFO] Main: Skipping '{theme}' ({score:.2f} similar to processed theme '{match}').")
+                telemetry.incr("themes_skipped", reason="similar_processed")
+                continue
+            if any(index.matches(theme, other) for other in selected):
+                telemetry.incr("themes_skipped", reason="similar_selected")
+                continue
+        selected.append(theme)
+        if len(selected) >= limit:
             break
-    if not next_theme_to_write:
-        new_search_suggestions = analysis.discover_new_search_themes(current_search_themes, processed_blog_themes)
-        if new_search_suggestions:
-            updated = list(dict.fromkeys(current_search_themes + new_search_suggestions))
-            save_current_search_themes(updated)
-            next_theme_to_write = new_search_suggestions[0]
-    if not next_theme_to_write:
-        print("\n--- ENGINE SHUTDOWN: No new theme available. ---")
-        return
-    print(f"[SUCCESS] Main: Selected theme: '{next_theme_to_write}'")
+    return selected
 
-    # STEP 4: GENERATE CONTENT
-    image_url = scraper.get_relevant_image_url(next_theme_to_write)
+def get_article_store():
+    """Article store shared by every run in this process (kept open between daemon runs)."""
+    global _article_store
+    if _article_store is None:
+        _article_store = article_store.ArticleStore()
+    return _article_store
+
+# --- MAIN WORKFLOW ---
+def _generate_and_score_blog(theme, all_articles):
+    blog_title, blog_post = generator_agent.generate_themed_blog_post(theme, all_articles)
+    if not blog_post or not blog_title:
+        return None
+    blog_scores, blog_reasoning = feedback.evaluate_blog_ai(blog_title, blog_post)
+    return {"title": blog_title, "post": blog_post, "scores": blog_scores, "reasoning": blog_reasoning}
+
+def generate_accepted_blog(theme, all_articles, candidates=None, max_attempts=MAX_ATTEMPTS, max_seconds=None):
+    """
+    Blog feedback loop. Each wave generates `candidates` drafts concurrently, scores them all and
+    keeps the best; the loop ends when the best clears FEEDBACK_SCORE_THRESHOLD or when the
+    attempt/time caps are hit, in which case the best draft so far is returned with accepted=False.
+    Returns a dict (title, post, scores, reasoning, attempts, accepted), or None if no draft was produced.
+    """
+    candidates = max(1, candidates or BLOG_SPECULATIVE_CANDIDATES)
+    max_seconds = BLOG_LOOP_MAX_SECONDS if max_seconds is None else max_seconds
+    deadline = time.monotonic() + max_seconds
+    best, attempts = None, 0
+
+    pool = ThreadPoolExecutor(max_workers=candidates)
+    try:
+        while attempts < max_attempts and time.monotonic() < deadline:
+            wave_size = min(candidates, max_attempts - attempts)
+            futures = [pool.submit(_generate_and_score_blog, theme, all_articles) for _ in range(wave_size)]
+            # The deadline also bounds the wave itself: drafts still running when it passes are abandoned
+            done, pending = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+            if pending:
+                print(f"  -> [WARNING] Main: Blog loop hit BLOG_LOOP_MAX_SECONDS; abandoning {len(pending)} unfinished drafts.")
+            attempts += wave_size
+            drafts = [d for d in (f.result() for f in futures if f in done) if d]
+            if not drafts:
+                # Failed or cancelled (malformed streamed output) drafts count as attempts; try another wave
+                continue
+            wave_best = max(drafts, key=lambda d: d["scores"].get("overall", 0.0))
+            if not best or wave_best["scores"].get("overall", 0.0) > best["scores"].get("overall", 0.0):
+                best = wave_best
+            if best["scores"].get("overall", 0.0) >= FEEDBACK_SCORE_THRESHOLD:
+                print(f"[SUCCESS] Blog accepted after {attempts} attempts | Overall score: {best['scores'].get('overall')}")
+                return dict(best, attempts=attempts, accepted=True)
+    finally:
+        # Abandoned drafts finish in the background; the loop does not wait for them
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if best:
+        print(f"[WARNING] Main: No blog draft reached {FEEDBACK_SCORE_THRESHOLD} within {attempts} attempts; "
+              f"using the best one (score {best['scores'].get('overall')}).")
+        return dict(best, attempts=attempts, accepted=False)
+    return None
+
+def run_theme_pipeline(next_theme_to_write, all_articles, run=None, guard=None):
+    """
+    Generate -> evaluate -> save -> publish for one theme.
+    With a checkpoint.RunCheckpoint as `run`, each stage output is checkpointed and stages that
+    already completed (in an interrupted run being resumed) are skipped. `guard`, if given, is
+    called before each side effect (recording feedback rewards, saving, publishing, marking the
+    theme processed) and may raise to abort, e.g. work_queue.Lease.check.
+    Returns True when the blog and social post were produced; safe to run concurrently.
+    """
+    with telemetry.span("engine.theme_pipeline", theme=next_theme_to_write) as span:
+        stages = run.for_theme(next_theme_to_write) if run else None
+        span["completed"] = _run_theme_pipeline(next_theme_to_write, all_articles, stages, guard or (lambda: None))
+        return span["completed"]
+
+def _run_theme_pipeline(next_theme_to_write, all_articles, stages, guard):
+    memory = FeedbackMemorySingleton
+    if stages and stages.has("finished"):
+        print(f"[INFO] Main: Theme '{next_theme_to_write}' already finished in this run; skipping.")
+        return True
+    image_url = stages.load("image") if stages else None
+    blog = stages.load("blog") if stages else None
+    social = stages.load("social") if stages else None
+
+    # STEP 4: GENERATE CONTENT (the image lookup runs in the background meanwhile)
     if not image_url:
-        image_url = "https://via.placeholder.com/800x400.png?text=Relevant+Image"
-    print("[SUCCESS] Main: Found relevant image.")
+        scraper.prefetch_image_urls([next_theme_to_write])
 
     # --- Feedback loop for blog ---
-    attempt = 1
-    accepted_blog = False
-    final_blog_scores = None
-    final_blog_reasoning = None
-    blog_title, blog_post = None, None
-
-    while not accepted_blog:
-        blog_title, blog_post = generator_agent.generate_themed_blog_post(next_theme_to_write, all_articles)
-        if not blog_post or not blog_title:
-            print("[ERROR] Main: Failed to generate blog post.")
-            return
+    if blog:
+        print(f"[INFO] Main: Loaded accepted blog for '{next_theme_to_write}' from checkpoint.")
+    else:
+        with telemetry.span("engine.blog_loop", theme=next_theme_to_write) as span:
+            blog = generate_accepted_blog(next_theme_to_write, all_articles)
+            span["attempts"] = blog["attempts"] if blog else None
+        if not blog:
+            print(f"[ERROR] Main: Failed to generate blog post for '{next_theme_to_write}'.")
+            return False
+        telemetry.observe("attempts_per_post", blog["attempts"], type="blog", accepted=blog["accepted"])
+        if stages:
+            stages.save("blog", blog)
+    # Rewards are recorded once per theme: by the lease holder, and skipped on resume once checkpointed
+    if not (stages and stages.has("blog_feedback")):
+        guard()
+        _record_blog_feedback(next_theme_to_write, blog, memory)
+        if stages:
+            stages.save("blog_feedback", True)
+    blog_title, blog_post = blog["title"], blog["post"]
+    final_blog_scores = blog["scores"]
 
-        blog_scores, blog_reasoning = feedback.evaluate_blog_ai(blog_title, blog_post)
+    # --- Feedback loop for social post ---
+    if social:
+        print(f"[INFO] Main: Loaded accepted social post for '{next_theme_to_write}' from checkpoint.")
+    else:
+        social = generate_accepted_social_post(next_theme_to_write, blog_title, blog_post)
+        if stages:
+            stages.save("social", social)
+    if not (stages and stages.has("social_feedback")):
+        guard()
+        _record_social_feedback(next_theme_to_write, blog_title, social, memory)
+        if stages:
+            stages.save("social_feedback", True)
+    social_post_text, final_social_scores = social["text"], social["scores"]
 
-        if blog_scores.get("overall", 0.0) >= FEEDBACK_SCORE_THRESHOLD:
-            accepted_blog = True
-            final_blog_scores = blog_scores
-            final_blog_reasoning = blog_reasoning
-            print(f"[SUCCESS] Blog accepted after {attempt} attempts | Overall score: {blog_scores.get('overall')}")
-        attempt += 1
+    # STEP 5: SAVE & PUBLISH
+    if not image_url:
+        with telemetry.span("engine.image_wait"):
+            image_url = scraper.get_relevant_image_url(next_theme_to_write)
+        if image_url:
+            print("[SUCCESS] Main: Found relevant image.")
+        else:
+            print("[WARNING] Main: No valid image found; using placeholder.")
+            image_url = PLACEHOLDER_IMAGE_URL
+        if stages:
+            stages.save("image", image_url)
+    saved = stages.load("saved") if stages else None
+    if not saved:
+        guard()
+        with telemetry.span("engine.save"):
+            blog_entry = create_markdown_file(blog_title, image_url, blog_post, scores=final_blog_scores, theme=next_theme_to_write)
+            social_entry = create_social_markdown_file(blog_title, social_post_text, scores=final_social_scores, theme=next_theme_to_write)
+        saved = {"blog": blog_entry and blog_entry["id"], "social": social_entry and social_entry["id"]}
+        if stages:
+            stages.save("saved", saved)
+
+    if not (stages and stages.has("published")):
+        guard()
+        final_telegram_message = social_post_text + f"\n\nRead our full analysis: [Link to your blog post about '{blog_title}']"
+        # Queued in the durable outbox; delivery runs in the background while other themes continue
+        social_id = saved.get("social") if isinstance(saved, dict) else None
+        with telemetry.span("engine.publish"):
+            queued = social_media_agent.post_to_telegram(final_telegram_message, ref=social_id)
+        if queued:
+            print("[SUCCESS] Main: Telegram post queued for publishing.")
+        if stages:
+            stages.save("published", bool(queued))
+
+    guard()
+    save_processed_blog_theme(next_theme_to_write)
+    if stages:
+        stages.save("finished", True)
+    print(f"[SUCCESS] Main: Finished theme '{next_theme_to_write}'.")
+    return True
 
-    # Safe memory update (fallback if add_tips not present)
-    try:
-        memory.add_tips(kind="blog", tips=blog_reasoning)
-    except AttributeError:
-        try:
-            memory.add_feedback("blog", blog_title, next_theme_to_write, final_blog_scores, final_blog_reasoning, attempt-1, accepted=True)
-        except Exception:
-            pass
+def _record_blog_feedback(theme, blog, memory):
+    blog_title = blog["title"]
+    final_blog_scores, final_blog_reasoning = blog["scores"], blog["reasoning"]
+    blog_reasoning = final_blog_reasoning
 
     feedback.record_feedback(
         content_type="blog",
         title=blog_title,
-        theme=next_theme_to_write,
+        theme=theme,
         scores=final_blog_scores,
         reasoning=final_blog_reasoning,
-        attempt=attempt-1,
-        accepted=True,
+        attempt=blog["attempts"],
+        accepted=blog["accepted"],
         threshold=FEEDBACK_SCORE_THRESHOLD
     )
+    memory.add_tips("blog", blog_reasoning, final_blog_scores)
 
-    # --- Feedback loop for social post ---
+def generate_accepted_social_post(theme, blog_title, blog_post):
+    """
+    Social feedback loop: regenerates the post until it clears FEEDBACK_SCORE_THRESHOLD.
+    Returns a dict (text, scores, reasoning, attempts).
+    """
     social_attempt = 1
     accepted_social = False
     final_social_scores = None
     final_social_reasoning = None
     social_post_text = None
 
-    while not accepted_social:
-        summary_excerpt = (blog_post or "")[:800]
-        social_post_text = social_media_agent.generate_social_post(blog_title, summary_excerpt)
-        social_scores, social_reasoning = feedback.evaluate_social_ai(blog_title, social_post_text)
-
-        if social_scores.get("overall", 0.0) >= FEEDBACK_SCORE_THRESHOLD:
-            accepted_social = True
-            final_social_scores = social_scores
-            final_social_reasoning = social_reasoning
-            print(f"[SUCCESS] Social post accepted after {social_attempt} attempts | Overall score: {social_scores.get('overall')}")
-        social_attempt += 1
-
-    try:
-        memory.add_tips(kind="social", tips=social_reasoning)
-    except AttributeError:
-        try:
-            memory.add_feedback("social", blog_title, next_theme_to_write, final_social_scores, final_social_reasoning, social_attempt-1, accepted=True)
-        except Exception:
-            pass
-
+    with telemetry.span("engine.social_loop", theme=theme) as span:
+        while not accepted_social:
+            summary_excerpt = (blog_post or "")[:800]
+            social_post_text = social_media_agent.generate_social_post(blog_title, summary_excerpt)
+            social_scores, social_reasoning = feedback.evaluate_social_ai(blog_title, social_post_text)
+
+            if social_scores.get("overall", 0.0) >= FEEDBACK_SCORE_THRESHOLD:
+                accepted_social = True
+                final_social_scores = social_scores
+                final_social_reasoning = social_reasoning
+                print(f"[SUCCESS] Social post accepted after {social_attempt} attempts | Overall score: {social_scores.get('overall')}")
+            social_attempt += 1
+        span["attempts"] = social_attempt - 1
+    telemetry.observe("attempts_per_post", social_attempt - 1, type="social", accepted=True)
+    return {"text": social_post_text, "scores": final_social_scores, "reasoning": final_social_reasoning,
+            "attempts": social_attempt - 1}
+
+def _record_social_feedback(theme, blog_title, social, memory):
     feedback.record_feedback(
         content_type="social",
         title=blog_title,
-        theme=next_theme_to_write,
-        scores=final_social_scores,
-        reasoning=final_social_reasoning,
-        attempt=social_attempt-1,
+        theme=theme,
+        scores=social["scores"],
+        reasoning=social["reasoning"],
+        attempt=social["attempts"],
         accepted=True,
         threshold=FEEDBACK_SCORE_THRESHOLD
     )
+    memory.add_tips("social", social["reasoning"], social["scores"])
+
+def _open_checkpoint(run_id, resume=None):
+    """Checkpoint for this run: the resumed run when `resume` is set (True = latest unfinished), else a new one."""
+    if resume:
+        run = checkpoint.resume(None if resume is True else resume)
+        if run:
+            print(f"[INFO] Main: Resuming run '{run.run_id}' from its checkpoints.")
+            run.mark("running")
+            return run
+        print("[WARNING] Main: No unfinished run to resume; starting a new run.")
+    return checkpoint.start(run_id)
+
+def run_content_engine(batch_size=None, workers=None, resume=None, queue=None):
+    """
+    One engine run: scrape and analyze once, then write up to `batch_size` unprocessed themes,
+    `workers` of them concurrently. Each run writes a trace and a metrics file (see telemetry.py)
+    and checkpoints its stage outputs (see checkpoint.py). With `resume` (True for the latest
+    unfinished run, or a run id), stages that run already completed are loaded instead of redone.
+    With a work_queue.WorkQueue as `queue`, the run only coordinates: the selected themes are
+    enqueued for worker processes (see run_worker) instead of being written here.
+    """
+    run_id = telemetry.start_run()
+    run = _open_checkpoint(run_id, resume)
+    try:
+        with telemetry.span("engine.run", checkpoint=run.run_id):
+            result = _run_content_engine(batch_size, workers, run, queue)
+        run.mark("complete")
+        return result
+    except BaseException:
+        run.mark("failed")
+        raise
+    finally:
+        telemetry.finish_run()
+
+def _run_content_engine(batch_size, workers, run, queue=None):
+    global START_DATE, END_DATE
+    print("--- LAUNCHING CONTENT CAMPAIGN ENGINE ---")
+    START_DATE, END_DATE = _date_window()  # Recomputed per run so a long-lived daemon keeps a rolling window
+    batch_size = max(1, batch_size or BATCH_SIZE)
 
-    # STEP 5: SAVE & PUBLISH
-    create_markdown_file(blog_title, image_url, blog_post, scores=final_blog_scores)
-    create_social_markdown_file(blog_title, social_post_text, scores=final_social_scores)
+    if not analysis.configure_ai():
+        print("  -> [WARNING] Main: Gemini not configured; feedback will fall back to heuristics.")
+
+    current_search_themes = load_current_search_themes()
+    processed_blog_themes = load_processed_blog_themes()
+    if queue is not None:
+        processed_blog_themes |= queue.themes()  # Queued themes are taken even before a worker finishes them
+
+    all_articles = run.load("articles")
+    if all_articles:
+        print(f"[INFO] Main: Loaded {len(all_articles)} articles from checkpoint.")
+    else:
+        # STEP 0: Expand themes if low
+        if not current_search_themes or (len(current_search_themes) < 4 and len(processed_blog_themes) > 3):
+            new_search_suggestions = analysis.discover_new_search_themes(current_search_themes, processed_blog_themes)
+            if new_search_suggestions:
+                updated = list(dict.fromkeys(current_search_themes + new_search_suggestions))
+                save_current_search_themes(updated)
+                current_search_themes = updated
+
+        # STEP 1: SCRAPE ARTICLES
+        with telemetry.span("engine.scrape"):
+            store = get_article_store() if INCREMENTAL_SCRAPING else None
+            all_articles = scraper.get_google_news_articles(
+                themes=current_search_themes, start_date=START_DATE, end_date=END_DATE, site_target=SITE_TARGET, store=store
+            )
+            if not all_articles:
+                new_search_suggestions = analysis.discover_new_search_themes(current_search_themes, processed_blog_themes)
+                if new_search_suggestions:
+                    all_articles = scraper.get_google_news_articles(
+                        themes=new_search_suggestions, start_date=START_DATE, end_date=END_DATE, site_target=SITE_TARGET, store=store
+                    )
+
+        if not all_articles:
+            print("\n--- ENGINE SHUTDOWN: No articles found. ---")
+            return
 
-    final_telegram_message = social_post_text + f"\n\nRead our full analysis: [Link to your blog post about '{blog_title}']"
+        # STEP 1b: FULL-TEXT ENRICHMENT (optional, bounded by FULLTEXT_DEADLINE_SECONDS)
+        if FULLTEXT_ENRICHMENT:
+            with telemetry.span("engine.fulltext"):
+                article_fetcher.enrich_articles(all_articles)
+        run.save("articles", all_articles)
+    print(f"[SUCCESS] Main: Found {len(all_articles)} articles.")
+
+    # STEP 2: ANALYZE THEMES
+    all_discussed_themes = run.load("themes")
+    if all_discussed_themes:
+        print("[INFO] Main: Loaded ranked themes from checkpoint.")
+    else:
+        with telemetry.span("engine.analysis"):
+            all_discussed_themes = analysis.find_highest_discussed_themes(all_articles)
+        if not all_discussed_themes:
+            print("\n--- ENGINE SHUTDOWN: No themes found. ---")
+            return
+        run.save("themes", all_discussed_themes)
+    print(f"[SUCCESS] Main: Identified {len(all_discussed_themes)} themes.")
+
+    # STEP 3: PICK NEXT THEME(S)
+    # Resumed runs keep their original selection: those themes may already be in the index
+    themes_to_write = run.load("selected")
+    if not themes_to_write:
+        index = get_theme_index()
+        themes_to_write = select_unprocessed_themes(all_discussed_themes, processed_blog_themes, batch_size, index)
+        if not themes_to_write:
+            new_search_suggestions = analysis.discover_new_search_themes(current_search_themes, processed_blog_themes)
+            if new_search_suggestions:
+                updated = list(dict.fromkeys(current_search_themes + new_search_suggestions))
+                save_current_search_themes(updated)
+                themes_to_write = select_unprocessed_themes(new_search_suggestions, processed_blog_themes, 1, index)
+        if not themes_to_write:
+            print("\n--- ENGINE SHUTDOWN: No new theme available. ---")
+            return
+        run.save("selected", themes_to_write)
+    for theme in themes_to_write:
+        print(f"[SUCCESS] Main: Selected theme: '{theme}'")
+
+    if queue is not None:
+        added = queue.enqueue(themes_to_write, all_articles)
+        print(f"\n--- CONTENT CAMPAIGN ENGINE RUN COMPLETE: {len(added)} themes enqueued for workers {queue.counts()} ---")
+        return
+
+    # Warm image lookups for the selected themes and the next few candidates while generation runs
+    taken = set(processed_blog_themes) | {t.lower() for t in themes_to_write}
+    scraper.prefetch_image_urls(
+        [t for t in themes_to_write if not run.for_theme(t).has("image")]
+        + select_unprocessed_themes(all_discussed_themes, taken, IMAGE_PREFETCH_EXTRA_THEMES)
+    )
+
+    # STEPS 4-5: GENERATE, EVALUATE, SAVE & PUBLISH per theme (sharing the scrape + analysis above)
+    workers = max(1, min(workers or BATCH_WORKERS, len(themes_to_write)))
+    if workers == 1:
+        results = [run_theme_pipeline(theme, all_articles, run) for theme in themes_to_write]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda theme: run_theme_pipeline(theme, all_articles, run), themes_to_write))
+
+    completed = sum(1 for ok in results if ok)
+    telemetry.incr("themes_completed", completed)
+    telemetry.incr("themes_failed", len(themes_to_write) - completed)
+    social_media_agent.flush_telegram_outbox(TELEGRAM_FLUSH_TIMEOUT_SECONDS)
+    print(f"\n--- CONTENT CAMPAIGN ENGINE RUN COMPLETE: {completed}/{len(themes_to_write)} themes published ---")
+
+def _run_queue_task(queue, task, worker_id):
+    """Runs one claimed task under its lease. Returns True when the theme was written and the task completed."""
+    theme = task["theme"]
+    print(f"[INFO] Main: Worker '{worker_id}' claimed '{theme}' (attempt {task['attempts']}).")
+    # Checkpoints are keyed by task, so a worker taking over an expired lease resumes the stages
+    # its predecessor finished (including whether the post was already published)
+    run = checkpoint.RunCheckpoint(f"task-{task['id']}", QUEUE_CHECKPOINT_DIR)
+    run.mark("running")
+    telemetry.start_run()
     try:
-        asyncio.run(social_media_agent.post_to_telegram(final_telegram_message))
-        print("[SUCCESS] Main: Telegram post published.")
-    except Exception:
-        pass
+        with queue.lease(task, worker_id) as lease:
+            try:
+                with telemetry.span("engine.queue_task", task=task["id"], attempt=task["attempts"]):
+                    ok = run_theme_pipeline(theme, queue.batch_articles(task["batch_id"]), run, guard=lease.check)
+            except work_queue.LeaseLost as e:
+                print(f"[WARNING] Main: {e} Leaving '{theme}' to its new owner.")
+                return False
+            except Exception as e:
+                print(f"[ERROR] Main: Theme '{theme}' failed; task is now {queue.fail(task['id'], worker_id, e)}. Error: {e}")
+                return False
+            if not ok:
+                status = queue.fail(task["id"], worker_id, "no blog post was produced")
+                print(f"[ERROR] Main: Theme '{theme}' produced no content; task is now {status}.")
+                return False
+            if not queue.complete(task["id"], worker_id):
+                # Everything is checkpointed as finished, so the new owner completes it without redoing work
+                print(f"[WARNING] Main: Lease on '{theme}' expired before completion; its new owner will close it.")
+                return False
+        run.mark("complete")
+        checkpoint.prune(QUEUE_CHECKPOINT_DIR)
+        return True
+    finally:
+        telemetry.finish_run()
+
+def run_worker(worker_id=None, idle_timeout=None):
+    """
+    Queue worker: claims themes enqueued by a coordinator (run_content_engine with a queue) and
+    runs their generate -> evaluate -> save -> publish pipeline one at a time, each under a lease
+    kept alive by heartbeats. Start one per core (or machine sharing the disk); every theme is
+    completed by exactly one of them. Exits after `idle_timeout` seconds without work
+    (WORKER_IDLE_EXIT_SECONDS; 0 = never). Returns the number of themes completed.
+    """
+    idle_timeout = WORKER_IDLE_EXIT_SECONDS if idle_timeout is None else idle_timeout
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue = get_work_queue()
+    if not analysis.configure_ai():
+        print("  -> [WARNING] Main: Gemini not configured; feedback will fall back to heuristics.")
 
-    save_processed_blog_theme(next_theme_to_write)
-    print("\n--- CONTENT CAMPAIGN ENGINE RUN COMPLETE ---")
+    print(f"--- QUEUE WORKER '{worker_id}' STARTED ---")
+    completed = 0
+    idle_since = time.monotonic()
+    while True:
+        task = queue.claim(worker_id)
+        if task is None:
+            if idle_timeout and time.monotonic() - idle_since >= idle_timeout:
+                break
+            time.sleep(WORKER_POLL_SECONDS)
+            continue
+        if _run_queue_task(queue, task, worker_id):
+            completed += 1
+        idle_since = time.monotonic()
+
+    social_media_agent.flush_telegram_outbox(TELEGRAM_FLUSH_TIMEOUT_SECONDS)
+    social_media_agent.close_telegram_publisher()
+    print(f"--- QUEUE WORKER '{worker_id}' STOPPED after {completed} themes ({queue.counts()}) ---")
+    return completed
+
+def run_sharded(processes, batch_size=None, resume=None, idle_timeout=None, speculative=None):
+    """
+    Coordinator plus `processes` local worker processes: enqueues this run's themes, then waits for
+    the workers. Settings the workers apply per theme (`speculative` drafts) are passed on to them.
+    """
+    run_content_engine(batch_size=batch_size, resume=resume, queue=get_work_queue())
+    speculative = max(1, speculative or BLOG_SPECULATIVE_CANDIDATES)
+    args = [sys.executable, os.path.abspath(__file__), "--worker", "--speculative", str(speculative)]
+    if idle_timeout is not None:
+        args += ["--idle-timeout", str(idle_timeout)]
+    workers = [subprocess.Popen(args) for _ in range(max(1, processes))]
+    return [w.wait() for w in workers]
+
+async def run_daemon(interval=None, batch_size=None, workers=None, max_runs=None, resume=None, queue=None):
+    """
+    Runs the engine every `interval` seconds inside one long-lived process, so the Gemini models,
+    response caches, article store, feedback memory and Telegram publisher stay warm between runs.
+    Each run executes in a worker thread; SIGINT/SIGTERM stop the loop once the current run ends.
+    With `resume`, the first run picks up an unfinished run; with `queue`, each run only enqueues
+    its themes for queue workers (see run_content_engine).
+    """
+    interval = DAEMON_INTERVAL_SECONDS if interval is None else interval
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Not supported on this platform; Ctrl+C interrupts the loop instead
+
+    print(f"--- CONTENT ENGINE DAEMON: one run every {interval:.0f}s ---")
+    runs = 0
+    while not stop.is_set():
+        started = loop.time()
+        try:
+            # Only the first run resumes; later runs always start fresh
+            await asyncio.to_thread(run_content_engine, batch_size, workers, resume if runs == 0 else None, queue)
+        except Exception as e:
+            print(f"[CRITICAL] Main: Daemon run failed. Error: {e}")
+        runs += 1
+        if max_runs and runs >= max_runs:
+            break
+        delay = interval - (loop.time() - started)
+        if delay <= 0:
+            print("[WARNING] Main: Run took longer than the interval; starting the next one now.")
+            continue
+        print(f"[INFO] Main: Next run in {delay:.0f}s.")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    social_media_agent.close_telegram_publisher()
+    print(f"--- CONTENT ENGINE DAEMON STOPPED after {runs} runs ---")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kenyan real estate content engine")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="Number of unprocessed themes to write this run")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Themes processed concurrently in batch mode")
+    parser.add_argument("--speculative", type=int, default=BLOG_SPECULATIVE_CANDIDATES,
+                        help="Blog drafts generated and scored concurrently per feedback wave")
+    parser.add_argument("--daemon", action="store_true", help="Keep running, starting a new run every --interval seconds")
+    parser.add_argument("--interval", type=float, default=DAEMON_INTERVAL_SECONDS, help="Seconds between daemon runs")
+    parser.add_argument("--max-runs", type=int, default=None, help="Stop the daemon after this many runs")
+    parser.add_argument("--resume", nargs="?", const=True, default=None, metavar="RUN_ID",
+                        help="Resume the latest unfinished run (or RUN_ID), skipping its completed stages")
+    parser.add_argument("--fulltext", action="store_true", default=FULLTEXT_ENRICHMENT,
+                        help="Fetch and extract full article text after scraping (or FULLTEXT_ENABLED=1)")
+    parser.add_argument("--enqueue", action="store_true",
+                        help="Coordinator: scrape, analyze and enqueue the selected themes for queue workers")
+    parser.add_argument("--worker", action="store_true", help="Queue worker: claim and write enqueued themes")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="Enqueue this run's themes, then write them with N local worker processes")
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="Seconds a queue worker waits for new tasks before exiting (0 = never)")
+    args = parser.parse_args()
+    BLOG_SPECULATIVE_CANDIDATES = max(1, args.speculative)
+    FULLTEXT_ENRICHMENT = args.fulltext
     try:
-        run_content_engine()
+        if args.worker:
+            run_worker(idle_timeout=args.idle_timeout)
+        elif args.processes:
+            run_sharded(args.processes, batch_size=args.batch, resume=args.resume, idle_timeout=args.idle_timeout,
+                        speculative=args.speculative)
+        elif args.daemon:
+            queue = get_work_queue() if args.enqueue else None
+            asyncio.run(run_daemon(args.interval, args.batch, args.workers, args.max_runs, args.resume, queue))
+        else:
+            run_content_engine(batch_size=args.batch, workers=args.workers, resume=args.resume,
+                               queue=get_work_queue() if args.enqueue else None)
     except Exception as e:
         print(f"[CRITICAL] Main: Unhandled exception. Error: {e}")
@@ -1,30 +1,19 @@
 # feedback.py
-import json
-import os
 from datetime import datetime
+from history_store import HistoryStore
+from reward_store import RewardStore
 
 # Files used to persist feedback & rewards
 FEEDBACK_LOG_FILE = "feedback.log"
-SCORES_HISTORY_FILE = "feedback_history.json"
-REWARD_STORE_FILE = "reward_store.json"
+SCORES_HISTORY_FILE = "feedback_history.jsonl"   # Append-only; migrated once from feedback_history.json
+LEGACY_SCORES_HISTORY_FILE = "feedback_history.json"
+REWARD_STORE_FILE = "reward_store.db"   # SQLite (WAL); migrated once from reward_store.json
+LEGACY_REWARD_STORE_FILE = "reward_store.json"
 
-# ----------------- Utility Functions -----------------
-def _load_json(path, default):
-    try:
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-    except Exception:
-        pass
-    return default
-
-def _save_json(path, data):
-    try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-    except Exception:
-        pass
+history_store = HistoryStore(SCORES_HISTORY_FILE, LEGACY_SCORES_HISTORY_FILE)
+reward_store = RewardStore(REWARD_STORE_FILE, LEGACY_REWARD_STORE_FILE)
 
+# ----------------- Utility Functions -----------------
 def _append_log(text):
     try:
         with open(FEEDBACK_LOG_FILE, "a", encoding="utf-8") as f:
@@ -33,12 +22,50 @@ def _append_log(text):
         pass
 
 # ----------------- Reinforcement Learning Helpers -----------------
-def _get_theme_history(theme, content_type):
-    history = _load_json(SCORES_HISTORY_FILE, [])
-    return [entry for entry in history if entry["theme"] == theme and entry["type"] == content_type]
+def _get_best_history_entry(theme, content_type):
+    """Best past entry for (theme, type) from the indexed history; O(1)."""
+    return history_store.best(theme, content_type)
+
+# ----------------- Feature Extraction -----------------
+def extract_features(content: str):
+    """
+    Tokenizes the text once and collects every feature the heuristic scorers need, reusing the
+    word list, lowercased text and line split instead of re-splitting per scorer.
+    Produces exactly the counts the old per-scorer split/lower/count passes did.
+    """
+    words = content.split()
+    # Splitting sentences on "." only changes the word count for tokens that contain a "."
+    sentence_words = len(words)
+    if "." in content:
+        for word in [w for w in words if "." in w]:
+            core = word.strip(".")
+            if not core:
+                sentence_words -= 1          # "..." contributes no words
+            elif "." in core:
+                sentence_words += len([p for p in core.split(".") if p]) - 1   # "3.5" -> 2 words
+
+    headings = 0
+    for line in content.split("\n"):
+        if line and (line.lstrip().startswith("#") or line.rstrip().endswith(":")):
+            headings += 1
+
+    lowered = content.lower()
+    return {
+        "word_count": len(words),
+        "sentence_words": sentence_words,
+        "sentences": content.count(".") + 1,
+        "question": "?" in content,
+        "exclamation": "!" in content,
+        "call_us": "call us" in lowered,
+        "learn_more": "learn more" in lowered,
+        "paragraphs": content.count("\n\n"),
+        "headings": headings,
+        "bullets": content.count("- ") + content.count("* "),
+    }
 
-def _score_length(content: str):
-    word_count = len(content.split())
+# ----------------- Feature Scorers -----------------
+def _score_length(features):
+    word_count = features["word_count"]
     if word_count < 100:
         return 0.5
     elif word_count < 500:
@@ -48,9 +75,8 @@ def _score_length(content: str):
     else:
         return 0.95
 
-def _score_clarity(content: str):
-    sentences = content.split(".")
-    avg_len = sum(len(s.split()) for s in sentences if s.strip()) / max(len(sentences), 1)
+def _score_clarity(features):
+    avg_len = features["sentence_words"] / max(features["sentences"], 1)
     if avg_len < 12:
         return 0.9
     elif avg_len < 20:
@@ -58,50 +84,67 @@ def _score_clarity(content: str):
     else:
         return 0.65
 
-def _score_engagement(content: str):
-    engagement_features = sum([
-        "?" in content,
-        "!" in content,
-        "call us" in content.lower(),
-        "learn more" in content.lower(),
-    ])
+def _score_engagement(features):
+    engagement_features = features["question"] + features["exclamation"] + features["call_us"] + features["learn_more"]
     return min(0.6 + 0.1 * engagement_features, 0.95)
 
-def _score_structure(content: str):
-    paragraphs = content.count("\n\n")
-    headings = sum(1 for line in content.split("\n") if line.strip().startswith("#") or line.strip().endswith(":"))
-    bullets = content.count("- ") + content.count("* ")
-    return min(0.6 + 0.1 * (paragraphs + headings + bullets), 0.95)
+def _score_structure(features):
+    return min(0.6 + 0.1 * (features["paragraphs"] + features["headings"] + features["bullets"]), 0.95)
 
-def _reinforce_with_history(theme, content_type, scores):
-    history = _get_theme_history(theme, content_type)
-    if history:
-        best = max(history, key=lambda x: x["scores"]["overall"])
+def _reinforce_with_history(theme, content_type, scores, has_history=None):
+    if has_history is None:
+        has_history = bool(_get_best_history_entry(theme, content_type))
+    if has_history:
         for key in scores:
             scores[key] = min(scores[key] + 0.05, 1.0)
     return scores
 
-def _compute_reinforced_scores(theme, content, content_type="blog"):
-    scores = {
-        "length": _score_length(content),
-        "clarity": _score_clarity(content),
-        "engagement": _score_engagement(content),
-        "structure": _score_structure(content),
-    }
-    scores = _reinforce_with_history(theme, content_type, scores)
+def _finalize(scores):
     scores["overall"] = round(sum(scores.values()) / len(scores), 2)
     return {k: round(v, 2) for k, v in scores.items()}
 
-def _compute_reinforced_social_scores(theme, title, content):
-    scores = {
-        "length": _score_length(content),
-        "clarity": _score_clarity(content),
-        "engagement": _score_engagement(content),
-        "relevance": 0.8 if theme.lower() in (title + content).lower() else 0.65,
+def _blog_scores(features):
+    return {
+        "length": _score_length(features),
+        "clarity": _score_clarity(features),
+        "engagement": _score_engagement(features),
+        "structure": _score_structure(features),
     }
-    scores = _reinforce_with_history(theme, "social", scores)
-    scores["overall"] = round(sum(scores.values()) / len(scores), 2)
-    return {k: round(v, 2) for k, v in scores.items()}
+
+def _social_scores(features, theme, title, content):
+    return {
+        "length": _score_length(features),
+        "clarity": _score_clarity(features),
+        "engagement": _score_engagement(features),
+        "relevance": 0.8 if theme and theme.lower() in (title + content).lower() else 0.65,
+    }
+
+def _compute_reinforced_scores(theme, content, content_type="blog"):
+    scores = _blog_scores(extract_features(content))
+    return _finalize(_reinforce_with_history(theme, content_type, scores))
+
+def _compute_reinforced_social_scores(theme, title, content):
+    scores = _social_scores(extract_features(content), theme, title, content)
+    return _finalize(_reinforce_with_history(theme, "social", scores))
+
+# ----------------- Batch Scoring -----------------
+def score_batch(contents, content_type="blog", theme=None, titles=None):
+    """
+    Scores many blog or social candidates in one call. Features are extracted in a single pass
+    per candidate and the history lookup for (theme, type) is done once for the whole batch.
+    Returns a list of score dicts in input order (same values as evaluate_*_ai).
+    """
+    has_history = bool(_get_best_history_entry(theme, content_type))
+    titles = titles or [""] * len(contents)
+    results = []
+    for content, title in zip(contents, titles):
+        features = extract_features(content)
+        if content_type == "social":
+            scores = _social_scores(features, theme, title, content)
+        else:
+            scores = _blog_scores(features)
+        results.append(_finalize(_reinforce_with_history(theme, content_type, scores, has_history)))
+    return results
 
 # ----------------- Public Evaluation -----------------
 def evaluate_blog_ai(title, content, theme=None):
@@ -119,27 +162,18 @@ def compute_reward_from_scores(scores, threshold=0.8):
     return round(max(scores.get("overall", 0) - threshold, 0.0), 3)
 
 def update_reward_store(theme, content_type, reward):
-    store = _load_json(REWARD_STORE_FILE, {"themes": {}, "by_type": {}})
-    
-    # Update per-theme rewards
-    t = store.get("themes", {}).get(theme, {"total_reward": 0.0, "count": 0})
-    t["total_reward"] = round(t.get("total_reward", 0.0) + reward, 3)
-    t["count"] = t.get("count", 0) + 1
-    t["avg"] = round(t["total_reward"] / t["count"], 3)
-    store.setdefault("themes", {})[theme] = t
-
-    # Update per-content-type rewards
-    bt = store.get("by_type", {}).get(content_type, {"total": 0.0, "count": 0})
-    bt["total"] = round(bt.get("total", 0.0) + reward, 3)
-    bt["count"] = bt.get("count", 0) + 1
-    bt["avg"] = round(bt["total"] / bt["count"], 3)
-    store.setdefault("by_type", {})[content_type] = bt
-
-    _save_json(REWARD_STORE_FILE, store)
-    return t["avg"]
+    """Adds the reward to the per-theme and per-type totals atomically. Returns the theme average."""
+    try:
+        return reward_store.update(theme, content_type, reward)
+    except Exception as e:
+        print(f"[ERROR] Feedback: Failed to update reward store. Error: {e}")
+        return None
+
+def load_reward_store():
+    """Current totals in the {"themes": ..., "by_type": ...} shape of the old reward_store.json."""
+    return reward_store.snapshot()
 
 def record_feedback(content_type, title, theme, scores, reasoning, attempt=1, accepted=True, threshold=0.8):
-    history = _load_json(SCORES_HISTORY_FILE, [])
     entry = {
         "timestamp": datetime.now().isoformat(),
         "type": content_type,
@@ -150,8 +184,7 @@ def record_feedback(content_type, title, theme, scores, reasoning, attempt=1, ac
         "attempt": attempt,
         "accepted": bool(accepted)
     }
-    history.append(entry)
-    _save_json(SCORES_HISTORY_FILE, history)
+    history_store.append(entry)
 
     reward = compute_reward_from_scores(scores, threshold)
     theme_avg = update_reward_store(theme, content_type, reward)
@@ -0,0 +1,148 @@
+# output_store.py
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# ----------------- CONFIG -----------------
+OUTPUT_DIR = os.getenv("OUTPUT_DIR", "output")
+MANIFEST_FILE = "manifest.db"
+
+def _slug(text, limit=80):
+    slug = re.sub(r"[^a-z0-9]+", "-", (text or "").lower()).strip("-")
+    return slug[:limit].rstrip("-") or "post"
+
+def atomic_write(path, content):
+    """Writes text through a temp file in the same directory, fsync and rename: readers see the old file or the new one."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+# ----------------- STORE -----------------
+class OutputStore:
+    """
+    Generated posts on disk plus a SQLite manifest of everything written.
+    Files are content-addressed under dated directories
+    (<OUTPUT_DIR>/<kind>/YYYY/MM/DD/<title-slug>-<hash>.md), so two posts never collide and
+    rewriting identical content is a no-op. The manifest is updated one row per post and indexed
+    by date, kind and theme, so listing stays fast without walking the directory tree.
+    """
+    def __init__(self, root=OUTPUT_DIR):
+        self.root = root
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.root, MANIFEST_FILE), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS posts ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, title TEXT NOT NULL, theme TEXT, path TEXT NOT NULL,"
+                " overall REAL, scores TEXT, created_at REAL NOT NULL, published_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_kind_created ON posts(kind, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_theme ON posts(theme)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def path_for(self, kind, title, content, created_at=None):
+        """Content-addressed path (relative to the store root) for a post."""
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+        day = time.strftime("%Y/%m/%d", time.localtime(created_at or time.time()))
+        return f"{kind}/{day}/{_slug(title)}-{digest}.md", digest
+
+    def save(self, kind, title, content, theme=None, scores=None):
+        """
+        Writes a post atomically and records it in the manifest. Returns the post's manifest row
+        as a dict (id, kind, title, theme, path, overall, scores, created_at, published_at).
+        Saving identical content again returns the existing entry.
+        """
+        now = time.time()
+        relative_path, digest = self.path_for(kind, title, content, now)
+        post_id = f"{kind}-{digest}"
+        existing = self.get(post_id)
+        if existing and os.path.exists(os.path.join(self.root, existing["path"])):
+            return existing
+        atomic_write(os.path.join(self.root, relative_path), content)
+        overall = (scores or {}).get("overall")
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO posts (id, kind, title, theme, path, overall, scores, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (post_id, kind, title, theme, relative_path, overall, json.dumps(scores or {}), now),
+            )
+            conn.commit()
+        return self.get(post_id)
+
+    def mark_published(self, post_id):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE posts SET published_at = ? WHERE id = ?", (time.time(), post_id))
+            conn.commit()
+
+    # ----------------- Queries -----------------
+    def _rows(self, sql, params):
+        with self._lock:
+            cur = self._connect().execute(sql, params)
+            columns = [c[0] for c in cur.description]
+            rows = cur.fetchall()
+        posts = []
+        for row in rows:
+            post = dict(zip(columns, row))
+            post["scores"] = json.loads(post["scores"] or "{}")
+            posts.append(post)
+        return posts
+
+    def get(self, post_id):
+        rows = self._rows("SELECT * FROM posts WHERE id = ?", (post_id,))
+        return rows[0] if rows else None
+
+    def list_posts(self, kind=None, theme=None, since=None, unpublished=False, limit=100):
+        """Newest posts first, filtered by kind, theme, creation time (epoch seconds) and publish state."""
+        clauses, params = [], []
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if theme:
+            clauses.append("theme = ?")
+            params.append(theme)
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if unpublished:
+            clauses.append("published_at IS NULL")
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._rows(f"SELECT * FROM posts{where} ORDER BY created_at DESC LIMIT ?", params + [limit])
+
+    def count(self, kind=None):
+        with self._lock:
+            conn = self._connect()
+            if kind:
+                return conn.execute("SELECT COUNT(*) FROM posts WHERE kind = ?", (kind,)).fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def read(self, post):
+        """Content of a manifest entry (as returned by get/list_posts)."""
+        with open(os.path.join(self.root, post["path"]), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
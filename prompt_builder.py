@@ -0,0 +1,78 @@
+# prompt_builder.py
+import math
+
+# Rough local estimate for Gemini/English text: ~4 characters per token
+CHARS_PER_TOKEN = 4
+MIN_SUMMARY_CHARS = 160  # Summaries are trimmed down to this before whole articles are dropped
+MIN_BODY_CHARS = 200     # Article bodies shorter than this share of the budget are left out entirely
+DEFAULT_ITEM_FORMAT = "Title: {title}\nSummary: {summary}"
+
+def estimate_tokens(text):
+    """Cheap local token estimate (no API call)."""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+def _truncate(text, max_chars):
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:") + "..."
+
+def build_articles_block(articles, token_budget, reserved_text="", label="Prompt",
+                         item_format=DEFAULT_ITEM_FORMAT, separator="\n"):
+    """
+    Formats articles (in priority order, most important first) into a prompt section that fits
+    `token_budget` together with `reserved_text` (the template/instructions around it).
+
+    Over budget, full-text bodies (the "body" key, used when item_format has {body}) are cut to an
+    equal share of what titles and summaries leave, then long summaries are trimmed, then the
+    lowest-priority articles are dropped.
+    Returns: (articles_text, stats) where stats has prompt_tokens, included, dropped and truncated.
+    """
+    available_chars = max(token_budget - estimate_tokens(reserved_text), 0) * CHARS_PER_TOKEN
+    items = [
+        {"title": (a.get("title") or "").strip(), "summary": (a.get("summary") or "").strip(),
+         "body": (a.get("body") or "").strip()}
+        for a in articles
+    ]
+
+    def render(entries):
+        return separator.join(item_format.format(**e) for e in entries)
+
+    trimmed = set()
+    text = render(items)
+    with_body = [idx for idx, item in enumerate(items) if item["body"]]
+    if len(text) > available_chars and with_body and "{body}" in item_format:
+        # Pass 0: split what titles and summaries leave equally between the article bodies
+        base = len(render([dict(item, body="") for item in items]))
+        share = max(available_chars - base, 0) // len(with_body)
+        for idx in with_body:
+            if len(items[idx]["body"]) > share:
+                items[idx]["body"] = _truncate(items[idx]["body"], share) if share >= MIN_BODY_CHARS else ""
+                trimmed.add(idx)
+        text = render(items)
+    if len(text) > available_chars:
+        # Pass 1: trim long summaries down to MIN_SUMMARY_CHARS
+        for idx, item in enumerate(items):
+            if len(item["summary"]) > MIN_SUMMARY_CHARS:
+                item["summary"] = _truncate(item["summary"], MIN_SUMMARY_CHARS)
+                trimmed.add(idx)
+        # Pass 2: keep the highest-priority prefix that fits
+        kept, used = [], 0
+        for item in items:
+            size = len(item_format.format(**item)) + (len(separator) if kept else 0)
+            if used + size > available_chars:
+                break
+            kept.append(item)
+            used += size
+        items = kept
+        text = render(items)
+
+    stats = {
+        "prompt_tokens": estimate_tokens(reserved_text) + estimate_tokens(text),
+        "included": len(items),
+        "dropped": len(articles) - len(items),
+        "truncated": len([idx for idx in trimmed if idx < len(items)]),
+    }
+    print(f"  -> [INFO] PromptBuilder: {label}: ~{stats['prompt_tokens']} tokens, "
+          f"{stats['included']}/{len(articles)} articles, {stats['truncated']} truncated, {stats['dropped']} dropped.")
+    return text, stats
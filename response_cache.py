@@ -0,0 +1,114 @@
+# response_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# ----------------- CONFIG -----------------
+DEFAULT_CACHE_FILE = "response_cache.db"
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL_SECONDS = 24 * 3600
+
+# ----------------- KEYING -----------------
+def make_cache_key(params, exclude=("api_key",)):
+    """
+    Builds a stable key from request params: drops secrets, normalizes keys/values and hashes the result.
+    """
+    normalized = {
+        str(k).strip().lower(): (str(v).strip() if not isinstance(v, (dict, list)) else v)
+        for k, v in params.items()
+        if k not in exclude and v is not None
+    }
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# ----------------- CACHE -----------------
+class ResponseCache:
+    """
+    Disk-backed (SQLite) response cache with per-namespace TTLs, size-bounded LRU eviction
+    and hit/miss counters. Safe to share between threads.
+    """
+    def __init__(self, path=DEFAULT_CACHE_FILE, ttls=None, default_ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, namespace TEXT NOT NULL, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def ttl_for(self, namespace):
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def get(self, namespace, key):
+        """Returns the cached value, or None when missing or older than the namespace TTL."""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ? AND namespace = ?", (key, namespace)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl_for(namespace):
+                    conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    conn.commit()
+                    self.hits[namespace] = self.hits.get(namespace, 0) + 1
+                    return json.loads(row[0])
+                if row:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    conn.commit()
+            except Exception as e:
+                print(f"  -> [WARNING] ResponseCache: Read failed. Error: {e}")
+            self.misses[namespace] = self.misses.get(namespace, 0) + 1
+            return None
+
+    def set(self, namespace, key, value):
+        """Stores a JSON-serializable value and evicts least recently used entries beyond max_entries."""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, namespace, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, namespace, json.dumps(value, ensure_ascii=False), now, now),
+                )
+                overflow = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                        (overflow,),
+                    )
+                conn.commit()
+            except Exception as e:
+                print(f"  -> [WARNING] ResponseCache: Write failed. Error: {e}")
+
+    def stats(self):
+        """Returns {namespace: {"hits": n, "misses": n}} for this process."""
+        namespaces = set(self.hits) | set(self.misses)
+        return {ns: {"hits": self.hits.get(ns, 0), "misses": self.misses.get(ns, 0)} for ns in sorted(namespaces)}
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,103 @@
+# reward_store.py
+import json
+import os
+import sqlite3
+import threading
+
+REWARD_STORE_FILE = "reward_store.db"
+LEGACY_REWARD_STORE_FILE = "reward_store.json"
+
+class RewardStore:
+    """
+    SQLite (WAL mode) reward totals per theme and per content type.
+    Each update is a single atomic UPSERT transaction, so concurrent engine processes
+    never lose increments and the cost per update does not grow with the number of themes.
+    """
+    def __init__(self, path=REWARD_STORE_FILE, legacy_path=LEGACY_REWARD_STORE_FILE):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS theme_rewards (theme TEXT PRIMARY KEY, total_reward REAL NOT NULL, count INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS type_rewards (content_type TEXT PRIMARY KEY, total REAL NOT NULL, count INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn = conn
+            self._migrate_legacy()
+        return self._conn
+
+    def _migrate_legacy(self):
+        """One-time import of the old reward_store.json totals."""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_migrated'").fetchone():
+                conn.execute("COMMIT")
+                return
+            store = {}
+            if self.legacy_path and os.path.exists(self.legacy_path):
+                try:
+                    with open(self.legacy_path, "r", encoding="utf-8") as f:
+                        raw = f.read().strip()
+                    store = json.loads(raw) if raw else {}
+                except Exception as e:
+                    print(f"[ERROR] RewardStore: Could not read legacy store '{self.legacy_path}'. {e}")
+            for theme, t in (store.get("themes") or {}).items():
+                conn.execute("INSERT OR REPLACE INTO theme_rewards VALUES (?, ?, ?)",
+                             (theme, t.get("total_reward", 0.0), t.get("count", 0)))
+            for content_type, bt in (store.get("by_type") or {}).items():
+                conn.execute("INSERT OR REPLACE INTO type_rewards VALUES (?, ?, ?)",
+                             (content_type, bt.get("total", 0.0), bt.get("count", 0)))
+            conn.execute("INSERT INTO meta VALUES ('legacy_migrated', '1')")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def update(self, theme, content_type, reward):
+        """Atomically adds a reward for (theme, content_type). Returns the theme's new average."""
+        theme = "null" if theme is None else str(theme)  # Same key json.dump gave a None theme
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO theme_rewards (theme, total_reward, count) VALUES (?, ROUND(?, 3), 1)"
+                    " ON CONFLICT(theme) DO UPDATE SET total_reward = ROUND(total_reward + excluded.total_reward, 3), count = count + 1",
+                    (theme, reward),
+                )
+                conn.execute(
+                    "INSERT INTO type_rewards (content_type, total, count) VALUES (?, ROUND(?, 3), 1)"
+                    " ON CONFLICT(content_type) DO UPDATE SET total = ROUND(total + excluded.total, 3), count = count + 1",
+                    (content_type, reward),
+                )
+                total, count = conn.execute(
+                    "SELECT total_reward, count FROM theme_rewards WHERE theme = ?", (theme,)
+                ).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return round(total / count, 3)
+
+    def snapshot(self):
+        """Returns the store in the legacy reward_store.json shape ({"themes": ..., "by_type": ...})."""
+        with self._lock:
+            conn = self._connect()
+            themes = conn.execute("SELECT theme, total_reward, count FROM theme_rewards").fetchall()
+            types = conn.execute("SELECT content_type, total, count FROM type_rewards").fetchall()
+        return {
+            "themes": {t: {"total_reward": total, "count": n, "avg": round(total / n, 3)} for t, total, n in themes},
+            "by_type": {c: {"total": total, "count": n, "avg": round(total / n, 3)} for c, total, n in types},
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
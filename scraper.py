@@ -1,11 +1,92 @@
 # scraper.py
-from serpapi import GoogleSearch
+import asyncio
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 import os
 from dotenv import load_dotenv
+from response_cache import ResponseCache, make_cache_key
+from dedup import dedupe_articles
+from article_store import parse_article_date
+import telemetry
 
 load_dotenv()
 SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
+GoogleSearch = None  # serpapi.GoogleSearch, imported on the first live search (see _search_client)
+
+# Concurrency for multi-theme fetching (1 = sequential) and SerpApi request rate (requests/sec, 0 = unlimited)
+SERPAPI_MAX_CONCURRENCY = int(os.getenv("SERPAPI_MAX_CONCURRENCY", "4"))
+SERPAPI_RATE_LIMIT = float(os.getenv("SERPAPI_RATE_LIMIT", "5"))
+
+# ----------------- RATE LIMITING -----------------
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces calls to a provider at no more than `rate` per second.
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+_serpapi_limiter = RateLimiter(SERPAPI_RATE_LIMIT)
+
+# ----------------- RESPONSE CACHE -----------------
+# Per-engine TTLs (seconds): news windows shift daily, image results are stable for longer
+SERPAPI_CACHE_ENABLED = os.getenv("SERPAPI_CACHE_ENABLED", "1") != "0"
+SERPAPI_CACHE_TTLS = {
+    "google_news": int(os.getenv("SERPAPI_NEWS_CACHE_TTL", str(24 * 3600))),
+    "google_images": int(os.getenv("SERPAPI_IMAGES_CACHE_TTL", str(7 * 24 * 3600))),
+}
+serpapi_cache = ResponseCache(
+    path=os.getenv("SERPAPI_CACHE_FILE", "serpapi_cache.db"),
+    ttls=SERPAPI_CACHE_TTLS,
+    max_entries=int(os.getenv("SERPAPI_CACHE_MAX_ENTRIES", "2000")),
+)
+
+def _search_client():
+    global GoogleSearch
+    if GoogleSearch is None:
+        from serpapi import GoogleSearch as client
+        GoogleSearch = client
+    return GoogleSearch
+
+def _serpapi_search(params):
+    """
+    Runs a SerpApi search through the disk cache (keyed by params minus api_key) and the rate limiter.
+    Error responses are never cached. Raises on API failure like GoogleSearch does.
+    """
+    engine = params.get("engine", "google")
+    key = make_cache_key(params)
+    if SERPAPI_CACHE_ENABLED:
+        cached = serpapi_cache.get(engine, key)
+        if cached is not None:
+            telemetry.incr("cache_hits", cache="serpapi", namespace=engine)
+            return cached
+        telemetry.incr("cache_misses", cache="serpapi", namespace=engine)
+
+    _serpapi_limiter.wait()
+    telemetry.incr("api_calls", provider="serpapi", endpoint=engine)
+    with telemetry.span("serpapi.search", engine=engine):
+        try:
+            results = _search_client()(params).get_dict()
+        except Exception:
+            telemetry.incr("api_errors", provider="serpapi", endpoint=engine)
+            raise
+    if SERPAPI_CACHE_ENABLED and results and not results.get("error"):
+        serpapi_cache.set(engine, key, results)
+    return results
 
 def _format_date(date_str):
     """
@@ -13,77 +94,134 @@ def _format_date(date_str):
     """
     return datetime.strptime(date_str, "%Y-%m-%d").strftime("%m/%d/%Y")
 
-def get_google_news_articles(themes, start_date, end_date, site_target=None, per_theme_limit=20):
+def _fetch_theme_articles(theme, start_date, end_date, site_target, per_theme_limit):
+    """
+    Runs the Google News search for a single theme (dates as YYYY-MM-DD) and returns its parsed articles.
+    Never raises: a failing theme yields None (an empty result yields []) so the other themes are unaffected.
+    """
+    query = f'"{theme}"' if " " in theme else theme
+    if site_target:
+        query += f" site:{site_target}"
+
+    print(f"  -> Scraper: Searching articles for theme: '{theme}' ...")
+    params = {
+        "engine": "google_news",   # preferred for news_results
+        "q": query,
+        "gl": "ke",
+        "hl": "en",
+        "api_key": SERPAPI_API_KEY,
+        "num": per_theme_limit,
+        "tbs": f"cdr:1,cd_min:{_format_date(start_date)},cd_max:{_format_date(end_date)}"
+    }
+
+    try:
+        results = _serpapi_search(params)
+    except Exception as e:
+        print(f"  -> [ERROR] Scraper: API call failed for theme '{theme}'. Error: {e}")
+        return None
+
+    # Prefer news_results but fallback to organic_results (search page with tbm=nws may populate organic_results)
+    articles = results.get("news_results") or results.get("organic_results") or []
+    if not articles:
+        print(f"  -> [INFO] Scraper: No results for theme '{theme}'.")
+        return []
+
+    theme_articles = []
+    for a in articles:
+        title = a.get("title") or a.get("headline") or ""
+        link = a.get("link") or a.get("source") or ""
+        summary = a.get("snippet") or a.get("summary") or title
+        # Only include if we have a link and a title
+        if title and link:
+            theme_articles.append({
+                "title": title.strip(),
+                "link": link.strip(),
+                "summary": summary.strip(),
+                "published": parse_article_date(a, end_date),
+            })
+    return theme_articles
+
+def get_google_news_articles(themes, start_date, end_date, site_target=None, per_theme_limit=20, max_workers=None, dedupe=True, store=None):
     """
     Performs Google News searches for each theme and collects articles.
-    Falls back to organic_results when needed and returns all collected articles.
+    With an article_store.ArticleStore as `store`, each theme only fetches the delta since its
+    watermark and the result is the stored articles for the whole [start_date, end_date] window.
+    Themes are fetched concurrently (up to `max_workers`, default SERPAPI_MAX_CONCURRENCY) under the
+    shared SerpApi rate limiter; results keep the order of `themes`.
+    Falls back to organic_results when needed. With `dedupe`, canonical-URL and near-duplicate
+    articles are collapsed (see dedup.py) before returning.
     """
     if not SERPAPI_API_KEY:
         print("  -> [ERROR] Scraper: SerpApi API key not found. Set SERPAPI_API_KEY in .env")
         return []
 
-    all_articles = []
-    start_date_formatted = _format_date(start_date)
-    end_date_formatted = _format_date(end_date)
-
     if not themes:
         print("  -> [INFO] Scraper: No themes provided to search.")
         return []
 
-    for theme in themes:
-        query = f'"{theme}"' if " " in theme else theme
-        if site_target:
-            query += f" site:{site_target}"
-
-        print(f"  -> Scraper: Searching articles for theme: '{theme}' ...")
-        params = {
-            "engine": "google_news",   # preferred for news_results
-            "q": query,
-            "gl": "ke",
-            "hl": "en",
-            "api_key": SERPAPI_API_KEY,
-            "num": per_theme_limit,
-            "tbs": f"cdr:1,cd_min:{start_date_formatted},cd_max:{end_date_formatted}"
-        }
+    with telemetry.span("scraper.fetch_articles", themes=len(themes), incremental=bool(store)) as span:
+        workers = max(1, min(max_workers or SERPAPI_MAX_CONCURRENCY, len(themes)))
+        fetch_args = [
+            (theme, store.fetch_start_date(theme, start_date) if store else start_date, end_date, site_target, per_theme_limit)
+            for theme in themes
+        ]
+        if workers == 1:
+            per_theme_results = [_fetch_theme_articles(*args) for args in fetch_args]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # map() yields results in submission order, so output order matches `themes`
+                per_theme_results = list(pool.map(lambda args: _fetch_theme_articles(*args), fetch_args))
+        # Counted from the raw fetches: with a store the results below are replaced by stored articles
+        span["failed_themes"] = sum(1 for r in per_theme_results if r is None)
 
-        try:
-            search = GoogleSearch(params)
-            results = search.get_dict()
-        except Exception as e:
-            print(f"  -> [ERROR] Scraper: API call failed for theme '{theme}'. Error: {e}")
-            continue
+        if store:
+            for theme, theme_articles in zip(themes, per_theme_results):
+                if theme_articles is not None:
+                    store.record_fetch(theme, theme_articles, end_date)
+            per_theme_results = [store.get_articles(theme, start_date, end_date) for theme in themes]
 
-        # Prefer news_results but fallback to organic_results (search page with tbm=nws may populate organic_results)
-        articles = results.get("news_results") or results.get("organic_results") or []
-        if not articles:
-            print(f"  -> [INFO] Scraper: No results for theme '{theme}'.")
-            continue
+        all_articles = [a for theme_articles in per_theme_results if theme_articles for a in theme_articles]
 
-        for a in articles:
-            title = a.get("title") or a.get("headline") or ""
-            link = a.get("link") or a.get("source") or ""
-            summary = a.get("snippet") or a.get("summary") or title
-            # Only include if we have a link and a title
-            if title and link:
-                all_articles.append({"title": title.strip(), "link": link.strip(), "summary": summary.strip()})
+        if dedupe and all_articles:
+            all_articles, report = dedupe_articles(all_articles)
+            collapsed = report["url_duplicates"] + report["near_duplicates"]
+            telemetry.incr("articles_deduplicated", collapsed)
+            if collapsed:
+                print(f"  -> [INFO] Scraper: Collapsed {collapsed} duplicate articles "
+                      f"({report['url_duplicates']} same URL, {report['near_duplicates']} near-duplicate).")
+        span["articles"] = len(all_articles)
+        telemetry.incr("articles_collected", len(all_articles))
 
     if not all_articles:
         print("  -> [INFO] Scraper: No news articles found for ANY theme in the given date range.")
     else:
         print(f"  -> [SUCCESS] Scraper: Collected {len(all_articles)} articles in total.")
+    if SERPAPI_CACHE_ENABLED:
+        print(f"  -> [INFO] Scraper: SerpApi cache stats: {serpapi_cache.stats()}")
 
     return all_articles
 
-def get_relevant_image_url(theme):
-    """
-    Searches for a relevant image using Google Images via SerpApi and returns the first direct image URL that passes basic filters.
-    """
-    print(f"  -> Scraper: Searching for a relevant image for theme: '{theme}'...")
-    if not SERPAPI_API_KEY:
-        print("  -> [ERROR] Scraper: SerpApi API key not found, cannot fetch image.")
-        return None
+# ----------------- IMAGE LOOKUP -----------------
+# Validated candidates are cached per theme; lookups run on a small pool so they can be prefetched
+IMAGE_CACHE_TTL = int(os.getenv("IMAGE_CACHE_TTL", str(3 * 24 * 3600)))
+IMAGE_MISS_TTL = int(os.getenv("IMAGE_MISS_TTL", "1800"))  # Themes with no usable image are not searched again before this
+IMAGE_MAX_CANDIDATES = int(os.getenv("IMAGE_MAX_CANDIDATES", "8"))
+IMAGE_PREFETCH_WORKERS = int(os.getenv("IMAGE_PREFETCH_WORKERS", "3"))
+IMAGE_VALIDATION_CONCURRENCY = int(os.getenv("IMAGE_VALIDATION_CONCURRENCY", "8"))
+IMAGE_VALIDATION_TIMEOUT_SECONDS = float(os.getenv("IMAGE_VALIDATION_TIMEOUT_SECONDS", "5"))
+BANNED_IMAGE_SOURCES = ["tiktok.com", "pinterest.com", "facebook.com", "instagram.com"]
 
-    BANNED_IMAGE_SOURCES = ["tiktok.com", "pinterest.com", "facebook.com", "instagram.com"]
+image_cache = ResponseCache(
+    path=os.getenv("IMAGE_CACHE_FILE", "image_cache.db"),
+    ttls={"image_candidates": IMAGE_CACHE_TTL, "image_missing": IMAGE_MISS_TTL},
+    max_entries=int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "500")),
+)
+_image_pool = None
+_image_futures = {}
+_image_lock = threading.RLock()
+
+def _search_image_candidates(theme):
+    """Direct image URLs from Google Images (via SerpApi) that pass the source/extension filters."""
     image_query = f"professional real estate {theme} kenya"
     params = {
         "q": image_query,
@@ -94,21 +232,122 @@ def get_relevant_image_url(theme):
     }
 
     try:
-        search = GoogleSearch(params)
-        results = search.get_dict()
+        results = _serpapi_search(params)
     except Exception as e:
         print(f"  -> [ERROR] Scraper: Image search failed. Error: {e}")
-        return None
+        return []
 
-    images = results.get("images_results") or []
-    for image_data in images:
+    candidates = []
+    for image_data in results.get("images_results") or []:
         source_domain = (image_data.get('source') or "").lower()
         image_url = image_data.get('original') or image_data.get('thumbnail') or ""
         is_banned = any(b in source_domain for b in BANNED_IMAGE_SOURCES)
         if is_banned:
             continue
-        if image_url and image_url.lower().endswith(('.jpg', '.jpeg', '.png')):
-            return image_url
+        if image_url and image_url.lower().endswith(('.jpg', '.jpeg', '.png')) and image_url not in candidates:
+            candidates.append(image_url)
+            if len(candidates) >= IMAGE_MAX_CANDIDATES:
+                break
+    return candidates
+
+async def _check_image_url(session, url):
+    import aiohttp
+    try:
+        async with session.head(url, allow_redirects=True) as resp:
+            status, content_type = resp.status, resp.headers.get("Content-Type", "")
+        if status in (403, 405, 501):
+            # Some CDNs reject HEAD; confirm with a one-byte ranged GET instead
+            async with session.get(url, headers={"Range": "bytes=0-0"}, allow_redirects=True) as resp:
+                status, content_type = resp.status, resp.headers.get("Content-Type", "")
+        return status in (200, 206) and content_type.lower().startswith("image/")
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        return False
+
+async def _validate_image_urls_async(urls):
+    import aiohttp  # Imported lazily: only image validation needs it here
+    connector = aiohttp.TCPConnector(limit=IMAGE_VALIDATION_CONCURRENCY, limit_per_host=4, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=IMAGE_VALIDATION_TIMEOUT_SECONDS)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        return await asyncio.gather(*(_check_image_url(session, url) for url in urls))
 
-    print("  -> [WARNING] Scraper: Could not find a direct suitable image link after checking results.")
-    return None
\ No newline at end of file
+def validate_image_urls(urls):
+    """
+    Checks candidate URLs concurrently with pooled HEAD requests and returns, in the original order,
+    the ones that resolve to an image. Each check is bounded by IMAGE_VALIDATION_TIMEOUT_SECONDS.
+    """
+    if not urls:
+        return []
+    try:
+        results = asyncio.run(_validate_image_urls_async(urls))
+    except Exception as e:
+        print(f"  -> [ERROR] Scraper: Image URL validation failed. Error: {e}")
+        return []
+    return [url for url, ok in zip(urls, results) if ok]
+
+def _lookup_image_url(theme):
+    if not SERPAPI_API_KEY:
+        print("  -> [ERROR] Scraper: SerpApi API key not found, cannot fetch image.")
+        return None
+    key = make_cache_key({"theme": theme.strip().lower()})
+    cached = image_cache.get("image_candidates", key)
+    if cached:
+        telemetry.incr("cache_hits", cache="image", namespace="image_candidates")
+        print(f"  -> [INFO] Scraper: Using cached image for theme: '{theme}'.")
+        return cached[0]
+    if image_cache.get("image_missing", key):
+        telemetry.incr("cache_hits", cache="image", namespace="image_missing")
+        print(f"  -> [INFO] Scraper: No image found for '{theme}' recently; skipping the search.")
+        return None
+    telemetry.incr("cache_misses", cache="image", namespace="image_candidates")
+
+    with telemetry.span("scraper.image_lookup", theme=theme) as span:
+        print(f"  -> Scraper: Searching for a relevant image for theme: '{theme}'...")
+        candidates = _search_image_candidates(theme)
+        with telemetry.span("scraper.image_validation", candidates=len(candidates)) as validation:
+            valid = validate_image_urls(candidates)
+            validation["valid"] = len(valid)
+        telemetry.incr("image_urls_rejected", len(candidates) - len(valid))
+        span["found"] = bool(valid)
+    if not valid:
+        print(f"  -> [WARNING] Scraper: None of {len(candidates)} image candidates for '{theme}' resolved to an image.")
+        # Remembered briefly so the on-demand lookup after a failed prefetch does not search again
+        image_cache.set("image_missing", key, True)
+        return None
+    image_cache.set("image_candidates", key, valid)
+    return valid[0]
+
+def prefetch_image_urls(themes):
+    """
+    Starts image lookups for `themes` in the background and returns {theme: Future}.
+    A theme that is already being looked up shares the in-flight lookup instead of starting another.
+    """
+    global _image_pool
+    futures = {}
+    with _image_lock:
+        if _image_pool is None:
+            _image_pool = ThreadPoolExecutor(max_workers=max(1, IMAGE_PREFETCH_WORKERS), thread_name_prefix="image-prefetch")
+        for theme in themes:
+            key = theme.strip().lower()
+            future = _image_futures.get(key)
+            if future is None:
+                future = _image_pool.submit(_lookup_image_url, theme)
+                _image_futures[key] = future
+                future.add_done_callback(lambda _, key=key: _forget_image_future(key))
+            futures[theme] = future
+    return futures
+
+def _forget_image_future(key):
+    # Finished lookups are served from image_cache from here on
+    with _image_lock:
+        _image_futures.pop(key, None)
+
+def get_relevant_image_url(theme):
+    """
+    Returns a validated direct image URL for the theme, or None. Served from the per-theme cache
+    when possible, and joins a running prefetch for the theme rather than searching twice.
+    """
+    try:
+        return prefetch_image_urls([theme])[theme].result()
+    except Exception as e:
+        print(f"  -> [ERROR] Scraper: Image lookup failed for '{theme}'. Error: {e}")
+        return None
@@ -1,21 +1,17 @@
 # social_media_agent.py
 
 import os
-import json
-import aiohttp
-import asyncio
+import threading
 from dotenv import load_dotenv
-import google.generativeai as genai
+import llm_client
+import telemetry
+from telegram_publisher import TelegramPublisher
 
 load_dotenv()
 
 # Load keys
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
 
 # ----------------- SOCIAL POST GENERATION -----------------
 SOCIAL_PROMPT_TEMPLATE = """
@@ -52,42 +48,73 @@ Respond ONLY with the final, polished Telegram post text, including the generate
 def generate_social_post(title: str, summary: str) -> str:
     """Generates a social media post from blog title + summary using Gemini."""
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash-latest")
         prompt = SOCIAL_PROMPT_TEMPLATE.format(title=title, summary=summary)
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        # Regenerated until accepted by the feedback loop, so every call needs a fresh draft
+        with telemetry.span("social.generate"):
+            post = llm_client.generate(prompt, use_cache=False)
+        telemetry.incr("drafts_generated", type="social")
+        return post
     except Exception as e:
         print(f"[ERROR] SocialMediaAgent: Failed to generate social post. Error: {e}")
         return f"{title} — {summary}"
 
 # ----------------- TELEGRAM PUBLISH -----------------
-async def _send_telegram_message_async(message: str):
-    """Internal async sender for Telegram."""
+_publisher = None
+_publisher_lock = threading.Lock()
+_sent_handlers = []
+
+def add_sent_handler(handler):
+    """Registers handler(ref), called when Telegram accepts a post queued with that ref."""
+    if handler not in _sent_handlers:
+        _sent_handlers.append(handler)
+
+def _message_sent(ref):
+    for handler in list(_sent_handlers):
+        handler(ref)
+
+def get_telegram_publisher():
+    """Shared background publisher (created on first use), or None when credentials are missing."""
+    global _publisher
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+        return None
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = TelegramPublisher(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, on_sent=_message_sent)
+            _publisher.start()  # Also delivers anything left in the outbox by earlier runs
+        return _publisher
+
+def post_to_telegram(message: str, ref=None):
+    """
+    Queues a Telegram message in the durable outbox and returns immediately.
+    Delivery (with retries) happens on the publisher's background worker; handlers registered
+    with add_sent_handler are called with `ref` once Telegram accepts it.
+    """
+    publisher = get_telegram_publisher()
+    if publisher is None:
         print("[ERROR] SocialMediaAgent: Telegram credentials not set.")
         return False
-
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {"chat_id": TELEGRAM_CHAT_ID, "text": message, "parse_mode": "HTML"}
-
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, data=payload) as resp:
-                if resp.status == 200:
-                    print("[SUCCESS] SocialMediaAgent: Post sent to Telegram.")
-                    return True
-                else:
-                    print(f"[ERROR] SocialMediaAgent: Telegram API failed with status {resp.status}")
-                    return False
-    except Exception as e:
-        print(f"[ERROR] SocialMediaAgent: Telegram send failed. Error: {e}")
-        return False
-
-def post_to_telegram(message: str):
-    """Public function to send a Telegram message synchronously."""
-    try:
-        asyncio.run(_send_telegram_message_async(message))
-    except RuntimeError:
-        # If already inside an event loop (rare), fallback
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(_send_telegram_message_async(message))
+    message_id = publisher.enqueue(message, ref)
+    telemetry.incr("telegram_messages_queued")
+    print(f"[INFO] SocialMediaAgent: Telegram post queued (outbox id {message_id}).")
+    return True
+
+def flush_telegram_outbox(timeout=30.0):
+    """Gives queued posts up to `timeout` seconds to go out; undelivered ones stay in the outbox."""
+    if _publisher is None:
+        return True
+    with telemetry.span("social.telegram_flush") as span:
+        drained = _publisher.drain(timeout)
+        span["pending"] = _publisher.outbox.pending_count()
+    telemetry.recorder.set_gauge("telegram_outbox_pending", span["pending"])
+    if not drained:
+        print(f"[WARNING] SocialMediaAgent: {span['pending']} Telegram posts still queued; "
+              f"they will be retried on the next run.")
+    return drained
+
+def close_telegram_publisher(timeout=5.0):
+    """Stops the background publisher (undelivered posts stay in the outbox for the next start)."""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is not None:
+            _publisher.stop(timeout)
+            _publisher = None
@@ -0,0 +1,232 @@
+# telegram_publisher.py
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+import telemetry
+
+# ----------------- CONFIG -----------------
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+TELEGRAM_OUTBOX_FILE = os.getenv("TELEGRAM_OUTBOX_FILE", "telegram_outbox.db")
+TELEGRAM_MAX_ATTEMPTS = int(os.getenv("TELEGRAM_MAX_ATTEMPTS", "8"))
+TELEGRAM_BACKOFF_BASE_SECONDS = float(os.getenv("TELEGRAM_BACKOFF_BASE_SECONDS", "2"))
+TELEGRAM_BACKOFF_MAX_SECONDS = 300
+TELEGRAM_REQUEST_TIMEOUT_SECONDS = 30
+TELEGRAM_CLAIM_SECONDS = 4 * TELEGRAM_REQUEST_TIMEOUT_SECONDS  # How long a claimed message is hidden from other publishers
+IDLE_POLL_SECONDS = 1.0
+
+# ----------------- OUTBOX -----------------
+class Outbox:
+    """
+    Durable SQLite queue of Telegram messages; survives crashes and restarts. Several processes
+    (e.g. queue workers) can share one outbox: each message is claimed before it is sent.
+    """
+    def __init__(self, path=TELEGRAM_OUTBOX_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id TEXT NOT NULL, text TEXT NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt_at REAL NOT NULL, last_error TEXT, created_at REAL NOT NULL, ref TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        if "ref" not in columns:  # Outboxes created before messages carried a reference
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN ref TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)")
+        self._conn.commit()
+
+    def add(self, chat_id, text, ref=None):
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO outbox (chat_id, text, next_attempt_at, created_at, ref) VALUES (?, ?, ?, ?, ?)",
+                (str(chat_id), text, now, now, ref),
+            )
+            self._conn.commit()
+            return cur.lastrowid
+
+    def next_due(self, claim_seconds=TELEGRAM_CLAIM_SECONDS):
+        """
+        Claims the oldest pending message whose retry time has come, as (id, chat_id, text, attempts, ref),
+        or None. Claimed messages are invisible to other publishers (in this or another process)
+        for `claim_seconds`; a claim left behind by a crashed process expires and is retried.
+        """
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, chat_id, text, attempts, ref FROM outbox"
+                    " WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?"
+                    " ORDER BY next_attempt_at, id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE outbox SET status = 'sending', next_attempt_at = ? WHERE id = ?", (now + claim_seconds, row[0])
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            return row
+
+    def seconds_until_next(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()
+        return None if row[0] is None else max(row[0] - time.time(), 0.0)
+
+    def mark_sent(self, message_id):
+        self._update("UPDATE outbox SET status = 'sent', attempts = attempts + 1, last_error = NULL WHERE id = ?", (message_id,))
+
+    def reschedule(self, message_id, delay, error):
+        self._update(
+            "UPDATE outbox SET status = 'pending', attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            (time.time() + delay, error, message_id),
+        )
+
+    def mark_failed(self, message_id, error):
+        self._update("UPDATE outbox SET status = 'failed', attempts = attempts + 1, last_error = ? WHERE id = ?", (error, message_id))
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')").fetchone()[0]
+
+    def _update(self, sql, params):
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+# ----------------- PUBLISHER -----------------
+class TelegramPublisher:
+    """
+    Background Telegram sender. Messages are written to the outbox and delivered by a worker
+    thread that reuses one keep-alive aiohttp session, honours 429 `retry_after` and retries
+    network/5xx failures with exponential backoff, so publishing never blocks content generation.
+    `on_sent(ref)` is called from the worker thread once Telegram accepts a message queued with a
+    `ref`, including messages left in the outbox by an earlier run.
+    """
+    def __init__(self, token, chat_id, api_base=TELEGRAM_API_BASE, outbox_path=TELEGRAM_OUTBOX_FILE,
+                 max_attempts=TELEGRAM_MAX_ATTEMPTS, on_sent=None):
+        self.token = token
+        self.chat_id = chat_id
+        self.api_base = api_base.rstrip("/")
+        self.max_attempts = max_attempts
+        self.outbox = Outbox(outbox_path)
+        self.on_sent = on_sent
+        self._thread = None
+        self._loop = None
+        self._wake = None
+        self._stopping = threading.Event()
+        self._paused_until = 0.0
+
+    # ----------------- Public API -----------------
+    def enqueue(self, text, ref=None):
+        """Durably queues a message and wakes the worker. Returns the outbox id."""
+        message_id = self.outbox.add(self.chat_id, text, ref)
+        self.start()
+        if self._loop and self._wake:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        return message_id
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="telegram-publisher", daemon=True)
+        self._thread.start()
+
+    def drain(self, timeout=30.0):
+        """Waits until the outbox has no pending messages (or timeout). Returns True when drained."""
+        deadline = time.monotonic() + timeout
+        while self.outbox.pending_count():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._loop and self._wake:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        if self._thread:
+            self._thread.join(timeout)
+
+    # ----------------- Worker -----------------
+    async def _run(self):
+        import aiohttp  # Imported lazily so importing the publisher stays cheap
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        connector = aiohttp.TCPConnector(limit=4, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=TELEGRAM_REQUEST_TIMEOUT_SECONDS)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            while not self._stopping.is_set():
+                pause = self._paused_until - time.time()
+                message = self.outbox.next_due() if pause <= 0 else None
+                if message:
+                    await self._deliver(session, *message)
+                    continue
+                wait = self.outbox.seconds_until_next()
+                wait = IDLE_POLL_SECONDS if wait is None else min(max(wait, pause, 0.05), IDLE_POLL_SECONDS)
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _backoff(self, attempts):
+        return min(TELEGRAM_BACKOFF_BASE_SECONDS * (2 ** attempts), TELEGRAM_BACKOFF_MAX_SECONDS)
+
+    def _retry_or_fail(self, message_id, attempts, delay, error):
+        telemetry.incr("api_errors", provider="telegram", endpoint="sendMessage")
+        if attempts + 1 >= self.max_attempts:
+            self.outbox.mark_failed(message_id, error)
+            telemetry.incr("telegram_messages", status="failed")
+            print(f"[ERROR] TelegramPublisher: Giving up on message {message_id} after {attempts + 1} attempts. {error}")
+        else:
+            self.outbox.reschedule(message_id, delay, error)
+            print(f"[WARNING] TelegramPublisher: Message {message_id} not sent ({error}); retrying in {delay:.0f}s.")
+
+    async def _deliver(self, session, message_id, chat_id, text, attempts, ref=None):
+        import aiohttp
+        url = f"{self.api_base}/bot{self.token}/sendMessage"
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+        try:
+            async with session.post(url, data=payload) as resp:
+                telemetry.incr("api_calls", provider="telegram", endpoint="sendMessage")
+                if resp.status == 200:
+                    self.outbox.mark_sent(message_id)
+                    telemetry.incr("telegram_messages", status="sent")
+                    print(f"[SUCCESS] TelegramPublisher: Message {message_id} sent to Telegram.")
+                    if ref and self.on_sent:
+                        try:
+                            self.on_sent(ref)
+                        except Exception as e:
+                            print(f"[WARNING] TelegramPublisher: on_sent for message {message_id} failed. Error: {e}")
+                    return
+                try:
+                    body = await resp.json(content_type=None)
+                except Exception:
+                    body = {}
+                error = f"HTTP {resp.status}: {(body or {}).get('description', '')}".strip()
+                if resp.status == 429:
+                    retry_after = float(((body or {}).get("parameters") or {}).get("retry_after")
+                                        or resp.headers.get("Retry-After") or 1)
+                    # Telegram rate limits are per bot, so hold the whole queue
+                    self._paused_until = time.time() + retry_after
+                    self._retry_or_fail(message_id, attempts, retry_after, error)
+                elif resp.status >= 500:
+                    self._retry_or_fail(message_id, attempts, self._backoff(attempts), error)
+                else:
+                    self.outbox.mark_failed(message_id, error)
+                    telemetry.incr("api_errors", provider="telegram", endpoint="sendMessage")
+                    telemetry.incr("telegram_messages", status="failed")
+                    print(f"[ERROR] TelegramPublisher: Telegram API rejected message {message_id}. {error}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._retry_or_fail(message_id, attempts, self._backoff(attempts), f"{type(e).__name__}: {e}")
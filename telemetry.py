@@ -0,0 +1,227 @@
+# telemetry.py
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# ----------------- CONFIG -----------------
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "1") != "0"
+TELEMETRY_DIR = os.getenv("TELEMETRY_DIR", "telemetry")
+METRIC_PREFIX = "content_engine"
+MAX_SPANS_PER_RUN = 20000  # Bounds trace size; extra spans still feed the duration metrics
+
+def rss_high_water_bytes():
+    """Process resident-set high-water mark in bytes (None where `resource` is unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key):
+    if not key:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, v in key)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + "}"
+
+# ----------------- RECORDER -----------------
+class Telemetry:
+    """
+    In-process spans, counters, summaries and memory high-water marks for one engine run.
+    Spans nest per thread; everything is thread-safe. export() writes a JSON trace and a
+    Prometheus text-format metrics file.
+    """
+    def __init__(self, enabled=TELEMETRY_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self, run_id=None):
+        with self._lock:
+            self.run_id = run_id or f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+            self.started_at = time.time()
+            self._t0 = time.perf_counter()
+            self.spans = []
+            self.dropped_spans = 0
+            self.counters = {}
+            self.summaries = {}
+            self.gauges = {}
+            self._next_span_id = 0
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Times the enclosed block. Yields the attribute dict so the block can attach results
+        (e.g. `s["articles"] = n`). Exceptions mark the span as an error and propagate.
+        """
+        if not self.enabled:
+            yield attrs
+            return
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        with self._lock:
+            self._next_span_id += 1
+            span_id = self._next_span_id
+        parent = stack[-1] if stack else None
+        stack.append(span_id)
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield attrs
+        except BaseException as e:
+            status = "error"
+            attrs["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            if stack and stack[-1] == span_id:
+                stack.pop()
+            elif span_id in stack:
+                stack.remove(span_id)  # Generator-held spans can close out of order
+            rss = rss_high_water_bytes()
+            record = {
+                "id": span_id, "parent": parent, "name": name, "thread": threading.current_thread().name,
+                "start": round(start - self._t0, 6), "duration": round(duration, 6), "status": status,
+                "attrs": attrs,
+            }
+            if rss:
+                record["rss_high_water_bytes"] = rss
+            with self._lock:
+                if len(self.spans) < MAX_SPANS_PER_RUN:
+                    self.spans.append(record)
+                else:
+                    self.dropped_spans += 1
+                self._observe_locked("span_duration_seconds", duration, {"span": name, "status": status})
+                if rss:
+                    key = ("process_rss_high_water_bytes", ())
+                    self.gauges[key] = max(self.gauges.get(key, 0), rss)
+
+    def incr(self, name, value=1, **labels):
+        """Adds `value` to the counter `name` (exported as <prefix>_<name>_total)."""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Records one observation of `name` (exported as a summary: _count, _sum and _max)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._observe_locked(name, value, labels)
+
+    def _observe_locked(self, name, value, labels):
+        key = (name, _label_key(labels))
+        slot = self.summaries.get(key)
+        if slot is None:
+            self.summaries[key] = [1, value, value]
+        else:
+            slot[0] += 1
+            slot[1] += value
+            slot[2] = max(slot[2], value)
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    # ----------------- Export -----------------
+    def trace(self):
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "started_at": self.started_at,
+                "duration_seconds": round(time.perf_counter() - self._t0, 6),
+                "spans": list(self.spans),
+                "dropped_spans": self.dropped_spans,
+                "counters": [{"name": n, "labels": dict(k), "value": v} for (n, k), v in sorted(self.counters.items())],
+                "summaries": [{"name": n, "labels": dict(k), "count": c, "sum": s, "max": m}
+                              for (n, k), (c, s, m) in sorted(self.summaries.items())],
+                "gauges": [{"name": n, "labels": dict(k), "value": v} for (n, k), v in sorted(self.gauges.items())],
+            }
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted(self.summaries.items())
+            gauges = sorted(self.gauges.items())
+            run_seconds = time.perf_counter() - self._t0
+        # Summary maxima are exported as their own gauge families (not part of the summary type)
+        gauges += [((f"{name}_max", key), slot[2]) for (name, key), slot in summaries]
+        gauges.sort()
+        gauges.append((("run_duration_seconds", ()), run_seconds))
+        gauges.append((("run_started_timestamp_seconds", ()), self.started_at))
+
+        def emit(kind, suffix, items):
+            declared = set()
+            for (name, key), value in items:
+                metric = f"{METRIC_PREFIX}_{name}{suffix}"
+                if metric not in declared:
+                    declared.add(metric)
+                    lines.append(f"# TYPE {metric} {kind}")
+                if kind == "summary":
+                    count, total, _ = value
+                    lines.append(f"{metric}_count{_format_labels(key)} {count}")
+                    lines.append(f"{metric}_sum{_format_labels(key)} {total:.6f}")
+                else:
+                    lines.append(f"{metric}{_format_labels(key)} {value}")
+
+        emit("counter", "_total", counters)
+        emit("summary", "", summaries)
+        emit("gauge", "", gauges)
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory=None):
+        """Writes trace-<run_id>.json and metrics.prom (latest run) atomically. Returns both paths."""
+        directory = directory or TELEMETRY_DIR
+        os.makedirs(directory, exist_ok=True)
+        trace_path = os.path.join(directory, f"trace-{self.run_id}.json")
+        metrics_path = os.path.join(directory, "metrics.prom")
+        for path, content in ((trace_path, json.dumps(self.trace(), ensure_ascii=False, default=str)),
+                              (metrics_path, self.prometheus_text())):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return trace_path, metrics_path
+
+# ----------------- MODULE API -----------------
+recorder = Telemetry()
+
+def span(name, **attrs):
+    return recorder.span(name, **attrs)
+
+def incr(name, value=1, **labels):
+    recorder.incr(name, value, **labels)
+
+def observe(name, value, **labels):
+    recorder.observe(name, value, **labels)
+
+def start_run(run_id=None):
+    """Clears the previous run's data. Returns the new run id."""
+    recorder.reset(run_id)
+    return recorder.run_id
+
+def finish_run(directory=None):
+    """Exports the current run; never raises. Returns (trace_path, metrics_path) or None."""
+    if not recorder.enabled:
+        return None
+    try:
+        paths = recorder.export(directory)
+        print(f"[INFO] Telemetry: Trace written to '{paths[0]}', metrics to '{paths[1]}'.")
+        return paths
+    except Exception as e:
+        print(f"[ERROR] Telemetry: Failed to export run telemetry. Error: {e}")
+        return None
@@ -0,0 +1,124 @@
+# tests/test_theme_index.py
+import os
+import tempfile
+import unittest
+
+import theme_index
+
+# Processed themes the index is seeded with, so IDF weights look like a real run's
+CORPUS = [
+    "Affordable housing projects in Nairobi",
+    "Mortgage rate changes in Kenya",
+    "Rental yields in Kilimani apartments",
+    "Land prices along the Nairobi Expressway",
+    "Foreign investment in Kenyan property",
+    "Housing levy deductions and their impact",
+    "Off-plan apartment sales in Westlands",
+    "Commercial office space oversupply in Nairobi",
+    "Gated communities in Kiambu county",
+    "Land title digitization at Ardhisasa",
+    "Student housing demand near universities",
+    "Serviced apartments for expatriates",
+    "Construction material cost inflation",
+    "Real estate investment trusts in Kenya",
+    "Mombasa beachfront property market",
+    "Satellite towns around Nairobi",
+    "Green building certification in Kenya",
+    "Rent control debate in Nairobi",
+    "Stamp duty changes for first-time buyers",
+    "Warehouse demand in Athi River",
+]
+
+# (processed theme, candidate) pairs that should be skipped as near-duplicates
+DUPLICATES = [
+    ("Affordable housing projects in Nairobi", "Nairobi affordable housing programme"),
+    ("Mortgage rate changes in Kenya", "Changes to mortgage rates in Kenya"),
+    ("Mortgage rate changes in Kenya", "Kenya mortgage rates"),
+    ("Rental yields in Kilimani apartments", "Kilimani apartment rental yields"),
+    ("Land prices along the Nairobi Expressway", "Nairobi Expressway land prices"),
+    ("Foreign investment in Kenyan property", "Foreign investors in Kenyan property"),
+    ("Housing levy deductions and their impact", "Impact of housing levy deductions"),
+    ("Off-plan apartment sales in Westlands", "Westlands off-plan apartments sales"),
+    ("Commercial office space oversupply in Nairobi", "Oversupply of office space in Nairobi"),
+    ("Gated communities in Kiambu county", "Kiambu gated communities"),
+    ("Student housing demand near universities", "Demand for student housing near universities"),
+    ("Construction material cost inflation", "Inflation in construction material costs"),
+    ("Real estate investment trusts in Kenya", "Kenyan real estate investment trusts"),
+    ("Mombasa beachfront property market", "The Mombasa beachfront property market"),
+    ("Rent control debate in Nairobi", "Nairobi rent control debate"),
+    ("Stamp duty changes for first-time buyers", "Stamp duty for first-time home buyers"),
+    ("Warehouse demand in Athi River", "Athi River warehouse demand"),
+    ("Satellite towns around Nairobi", "Nairobi satellite towns"),
+    # Narrowed or widened by one word
+    ("Off-plan apartment sales in Westlands", "Off-plan sales in Westlands"),
+    ("Rent control debate in Nairobi", "Rent control debate"),
+    ("Satellite towns around Nairobi", "Growth of satellite towns around Nairobi"),
+    ("Green building certification in Kenya", "Green building certification"),
+    ("Commercial office space oversupply in Nairobi", "Office space oversupply in Nairobi"),
+]
+
+# (processed theme, candidate) pairs that are new work and must not be skipped
+DISTINCT = [
+    # Same theme in another place
+    ("Affordable housing projects in Nairobi", "Affordable housing projects in Mombasa"),
+    ("Affordable housing projects in Nairobi", "Affordable housing projects in Kisumu"),
+    ("Rental yields in Kilimani apartments", "Rental yields in Westlands apartments"),
+    ("Gated communities in Kiambu county", "Gated communities in Machakos county"),
+    ("Off-plan apartment sales in Westlands", "Off-plan apartment sales in Kilimani"),
+    ("Land prices along the Nairobi Expressway", "Land prices along the Thika Superhighway"),
+    ("Green building certification in Kenya", "Green building certification in Uganda"),
+    ("Real estate investment trusts in Kenya", "Real estate investment trusts in Nigeria"),
+    # Same framing, another subject
+    ("Foreign investment in Kenyan property", "Foreign investment in Kenyan tech"),
+    ("Affordable housing projects in Nairobi", "Affordable housing levy"),
+    ("Mortgage rate changes in Kenya", "Rental rate changes in Kenya"),
+    ("Warehouse demand in Athi River", "Office demand in Athi River"),
+    ("Student housing demand near universities", "Affordable housing demand near universities"),
+    ("Commercial office space oversupply in Nairobi", "Commercial retail space oversupply in Nairobi"),
+    ("Serviced apartments for expatriates", "Serviced apartments for students"),
+    ("Housing levy deductions and their impact", "Housing levy refunds and their impact"),
+    ("Land title digitization at Ardhisasa", "Land rates digitization at Ardhisasa"),
+    ("Stamp duty changes for first-time buyers", "Stamp duty changes for land transfers"),
+    # A broader theme, or one that adds a new subject
+    ("Housing levy deductions and their impact", "Housing"),
+    ("Real estate investment trusts in Kenya", "Real estate in Kenya"),
+    ("Mortgage rate changes in Kenya", "Mortgage rates for diaspora buyers in Kenya"),
+    ("Land prices along the Nairobi Expressway", "Land prices"),
+    ("Student housing demand near universities", "Student housing construction loans near universities"),
+]
+
+class ThemeIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = theme_index.ThemeIndex(os.path.join(self.tmp.name, "theme_index.db"))
+        self.index.import_themes(CORPUS)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_duplicate_pairs_match(self):
+        for processed, candidate in DUPLICATES:
+            with self.subTest(candidate=candidate):
+                self.assertTrue(self.index.matches(processed, candidate))
+                self.assertTrue(self.index.is_duplicate(candidate))
+
+    def test_distinct_pairs_do_not_match(self):
+        for processed, candidate in DISTINCT:
+            with self.subTest(candidate=candidate):
+                self.assertFalse(self.index.matches(processed, candidate))
+                self.assertFalse(self.index.is_duplicate(candidate))
+
+    def test_most_similar_names_the_processed_theme(self):
+        score, match = self.index.most_similar("Nairobi affordable housing programme")
+        self.assertGreaterEqual(score, self.index.threshold)
+        self.assertEqual(match, "Affordable housing projects in Nairobi")
+
+    def test_new_themes_are_found_after_add(self):
+        candidate = "Affordable housing projects in Mombasa"
+        self.assertFalse(self.index.is_duplicate(candidate))
+        self.index.add(candidate)
+        self.assertTrue(self.index.is_duplicate("Mombasa affordable housing projects"))
+
+if __name__ == "__main__":
+    unittest.main()
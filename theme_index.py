@@ -0,0 +1,253 @@
+# theme_index.py
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+
+# ----------------- CONFIG -----------------
+THEME_INDEX_FILE = "theme_index.db"
+THEME_SIMILARITY_THRESHOLD = float(os.getenv("THEME_SIMILARITY_THRESHOLD", "0.6"))  # Calibrated on tests/test_theme_index.py
+NGRAM_SIZE = 5  # Longer grams keep posting lists short; trigrams made lookups ~10x slower at 30k themes
+REBUILD_GROWTH = 0.1  # Re-derive IDF weights and postings once the index has grown by 10%
+
+_STOPWORDS = {"a", "an", "and", "at", "by", "for", "in", "of", "on", "the", "to", "with"}
+# Words that rephrase a theme without changing its subject; ignored when comparing theme words
+_GENERIC_WORDS = {"analysi", "change", "impact", "initiative", "latest", "new", "outlook", "overview", "plan",
+                  "program", "programme", "project", "scheme", "their", "trend", "update"}
+MAX_EXTRA_WORDS = 1  # Subject words one theme may add to another and still be a near-duplicate
+SAME_WORD_PREFIX = 5  # Words sharing this long a prefix (and most of the shorter word) are variants: investors/investment
+
+# ----------------- VECTORS -----------------
+def normalize_theme(theme):
+    """Lowercased content words with a naive plural strip (matches analysis._theme_words)."""
+    words = re.findall(r"[a-z0-9]+", (theme or "").lower())
+    return " ".join(w[:-1] if len(w) > 3 and w.endswith("s") else w for w in words if w not in _STOPWORDS)
+
+def theme_ngrams(theme, n=NGRAM_SIZE):
+    """Character n-gram counts per word (padded), so word order does not matter."""
+    grams = Counter()
+    for word in normalize_theme(theme).split():
+        padded = f" {word} "
+        grams.update(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+    return grams
+
+def theme_words(theme):
+    """Normalized words that carry the theme's subject (generic rephrasing words removed)."""
+    return frozenset(w for w in normalize_theme(theme).split() if w not in _GENERIC_WORDS)
+
+def _same_word(a, b):
+    if a == b:
+        return True
+    prefix = len(os.path.commonprefix((a, b)))
+    return prefix >= SAME_WORD_PREFIX and prefix >= 0.6 * min(len(a), len(b))
+
+def words_compatible(a, b):
+    """
+    Whether two themes' subject words (theme_words) allow them to be the same theme. Reordered
+    and rephrased themes are compatible, and so is narrowing a theme by one word ("Rent control
+    debate" vs "... in Nairobi"). Substituting a word ("... in Nairobi" vs "... in Mombasa",
+    "Kenyan property" vs "Kenyan tech") or adding a new subject ("Real estate in Kenya" vs
+    "Real estate investment trusts in Kenya") is not.
+    """
+    a_rest, b_rest = a - b, b - a
+    only_a = sum(1 for w in a_rest if not any(_same_word(w, x) for x in b_rest))
+    only_b = sum(1 for w in b_rest if not any(_same_word(w, x) for x in a_rest))
+    return min(only_a, only_b) == 0 and max(only_a, only_b) <= MAX_EXTRA_WORDS
+
+# ----------------- INDEX -----------------
+class ThemeIndex:
+    """
+    Persistent similarity index over processed themes: character n-gram TF-IDF vectors compared
+    by cosine similarity. Themes live in SQLite; vectors are built in memory on first use and kept
+    current incrementally, including themes added by other processes.
+
+    Two themes match when their cosine similarity reaches the threshold and neither has
+    substituted a subject word of the other (see words_compatible): n-gram similarity alone
+    cannot tell "Affordable housing projects in Nairobi" from "... in Mombasa".
+
+    Lookups use prefix filtering: n-grams are ordered rarest first, and each theme is posted only
+    under the rare n-grams that carry enough of its weight to reach the threshold. Any theme at or
+    above the threshold shares one of those n-grams with the query, so posting lists stay short
+    and the answer is exact for matches at or above the threshold.
+    """
+    def __init__(self, path=THEME_INDEX_FILE, threshold=None):
+        self.path = path
+        self.threshold = THEME_SIMILARITY_THRESHOLD if threshold is None else threshold
+        self._conn = None
+        self._lock = threading.RLock()
+        self._last_id = 0
+        self._themes = []
+        self._counts = []       # Raw n-gram counts per theme
+        self._words = []        # Subject words per theme (theme_words)
+        self._vectors = []      # Unit-length TF-IDF vectors per theme
+        self._exact = {}        # Normalized phrase -> theme position
+        self._postings = defaultdict(list)
+        # IDF weights and the rarest-first order are frozen between rebuilds so that indexed
+        # prefixes and query prefixes always agree
+        self._df = {}
+        self._built_size = 0
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS themes ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, theme TEXT NOT NULL, normalized TEXT NOT NULL UNIQUE,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    # ----------------- Weighting -----------------
+    def _vector(self, counts):
+        """
+        Unit-length TF-IDF vector under the frozen document frequencies. IDF is square-rooted so that
+        rare place names do not outweigh the topic words as the index grows.
+        """
+        n = self._built_size
+        weights = {g: tf * math.sqrt(math.log((n + 1) / (self._df.get(g, 0) + 1)) + 1) for g, tf in counts.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {g: w / norm for g, w in weights.items()}
+
+    def _prefix(self, vector):
+        """Rarest n-grams of the vector, up to the point where the rest can no longer reach the threshold."""
+        remaining = 1.0
+        prefix = []
+        for gram in sorted(vector, key=lambda g: (self._df.get(g, 0), g)):
+            if math.sqrt(max(remaining, 0.0)) < self.threshold:
+                break
+            prefix.append(gram)
+            remaining -= vector[gram] ** 2
+        return prefix
+
+    def _post(self, doc):
+        for gram in self._prefix(self._vectors[doc]):
+            self._postings[gram].append(doc)
+
+    def _rebuild(self):
+        df = Counter()
+        for counts in self._counts:
+            df.update(counts.keys())
+        self._df = dict(df)
+        self._built_size = len(self._counts)
+        self._vectors = [self._vector(c) for c in self._counts]
+        self._postings = defaultdict(list)
+        for doc in range(len(self._vectors)):
+            self._post(doc)
+
+    def _refresh(self):
+        """Indexes themes stored since the last refresh (by this or another process)."""
+        rows = self._connect().execute(
+            "SELECT id, theme, normalized FROM themes WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        added = []
+        for theme_id, theme, normalized in rows:
+            self._last_id = theme_id
+            if normalized in self._exact:
+                continue
+            self._exact[normalized] = len(self._themes)
+            self._themes.append(theme)
+            self._counts.append(theme_ngrams(theme))
+            self._words.append(theme_words(theme))
+            added.append(len(self._themes) - 1)
+        if not added:
+            return
+        if len(self._themes) > self._built_size * (1 + REBUILD_GROWTH):
+            self._rebuild()
+        else:
+            for doc in added:
+                self._vectors.append(self._vector(self._counts[doc]))
+                self._post(doc)
+
+    # ----------------- Public API -----------------
+    def add(self, theme):
+        """Stores a processed theme. Returns False when an equivalent theme is already indexed."""
+        normalized = normalize_theme(theme)
+        if not normalized:
+            return False
+        with self._lock:
+            conn = self._connect()
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO themes (theme, normalized, created_at) VALUES (?, ?, ?)",
+                (theme.strip(), normalized, time.time()),
+            )
+            conn.commit()
+            self._refresh()
+            return cur.rowcount > 0
+
+    def import_themes(self, themes):
+        """Bulk-adds themes (e.g. from processed_blog_themes.log). Returns how many were new."""
+        now = time.time()
+        rows = [(t.strip(), n, now) for t, n in ((t, normalize_theme(t)) for t in themes) if n]
+        with self._lock:
+            conn = self._connect()
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO themes (theme, normalized, created_at) VALUES (?, ?, ?)", rows)
+            conn.commit()
+            added = conn.total_changes - before
+            self._refresh()
+            return added
+
+    def most_similar(self, theme):
+        """
+        (cosine similarity, stored theme) for the closest processed theme whose words are
+        compatible with `theme`. Exact whenever the best match reaches the threshold; below it, the
+        score is only a lower bound and may be (0.0, None).
+        """
+        counts = theme_ngrams(theme)
+        if not counts:
+            return 0.0, None
+        with self._lock:
+            self._refresh()
+            if not self._themes:
+                return 0.0, None
+            exact = self._exact.get(normalize_theme(theme))
+            if exact is not None:
+                return 1.0, self._themes[exact]
+
+            query = self._vector(counts)
+            words = theme_words(theme)
+            candidates = set()
+            for gram in self._prefix(query):
+                candidates.update(self._postings.get(gram, ()))
+            best_score, best_doc = 0.0, None
+            for doc in candidates:
+                vector = self._vectors[doc]
+                score = sum(w * vector[g] for g, w in query.items() if g in vector)
+                # Below the threshold the score is only a lower bound, so words are checked for matches only
+                if score > best_score and (score < self.threshold or words_compatible(words, self._words[doc])):
+                    best_score, best_doc = score, doc
+            return min(best_score, 1.0), self._themes[best_doc] if best_doc is not None else None
+
+    def similarity(self, a, b):
+        """Cosine similarity of two themes under the index's IDF weights."""
+        with self._lock:
+            self._refresh()
+            va = self._vector(theme_ngrams(a))
+            vb = self._vector(theme_ngrams(b))
+        return sum(w * vb[g] for g, w in va.items() if g in vb)
+
+    def matches(self, a, b):
+        """True when two themes count as near-duplicates (similar enough, with compatible words)."""
+        return self.similarity(a, b) >= self.threshold and words_compatible(theme_words(a), theme_words(b))
+
+    def is_duplicate(self, theme):
+        """True when some processed theme is at least `threshold` similar."""
+        score, _ = self.most_similar(theme)
+        return score >= self.threshold
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._themes)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,233 @@
+# work_queue.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from theme_index import normalize_theme
+
+# ----------------- CONFIG -----------------
+WORK_QUEUE_FILE = os.getenv("WORK_QUEUE_FILE", "work_queue.db")
+LEASE_SECONDS = float(os.getenv("WORK_QUEUE_LEASE_SECONDS", "120"))  # A worker that stops heartbeating loses its task after this
+MAX_TASK_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+
+class LeaseLost(Exception):
+    """The task's lease expired or was taken over by another worker; the holder must stop."""
+
+# ----------------- QUEUE -----------------
+class WorkQueue:
+    """
+    SQLite-backed queue of themes to write, shared by processes on one disk (WAL mode).
+    A coordinator enqueues themes together with the articles they were drawn from; workers claim
+    one task at a time under a lease they keep alive with heartbeats. Expired leases are
+    reclaimed by other workers. Every state change is conditional on the caller still holding
+    the lease, so a stalled worker cannot complete a task someone else has taken over.
+    A task whose lease expires max_attempts times (its worker keeps dying) is marked failed.
+    Themes are keyed by their normalized text, so the same theme is only enqueued again once
+    its task has failed.
+    """
+    def __init__(self, path=WORK_QUEUE_FILE, lease_seconds=LEASE_SECONDS, max_attempts=MAX_TASK_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._conn = None
+        self._lock = threading.Lock()
+        self._batches = {}
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS batches (id INTEGER PRIMARY KEY AUTOINCREMENT, articles TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, theme TEXT NOT NULL, theme_key TEXT NOT NULL UNIQUE,"
+                " batch_id INTEGER NOT NULL, status TEXT NOT NULL DEFAULT 'queued', owner TEXT,"
+                " lease_expires_at REAL, attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT,"
+                " enqueued_at REAL NOT NULL, finished_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks(status, lease_expires_at, id)")
+            self._conn = conn
+        return self._conn
+
+    def _write(self, fn):
+        """Runs fn(conn) in one IMMEDIATE transaction (serialized across processes)."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+                conn.execute("COMMIT")
+                return result
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    # ----------------- Coordinator -----------------
+    def enqueue(self, themes, articles):
+        """
+        Adds themes (sharing one article batch). Themes already in the queue are skipped unless
+        their task failed, in which case it is requeued with fresh attempts. Returns the added themes.
+        """
+        now = time.time()
+
+        def insert(conn):
+            batch_id = conn.execute(
+                "INSERT INTO batches (articles, created_at) VALUES (?, ?)", (json.dumps(articles, ensure_ascii=False), now)
+            ).lastrowid
+            added = []
+            for theme in themes:
+                key = normalize_theme(theme) or theme.strip().lower()
+                cur = conn.execute(
+                    "INSERT INTO tasks (theme, theme_key, batch_id, enqueued_at) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(theme_key) DO UPDATE SET theme = excluded.theme, batch_id = excluded.batch_id,"
+                    " status = 'queued', owner = NULL, lease_expires_at = NULL, attempts = 0,"
+                    " enqueued_at = excluded.enqueued_at, finished_at = NULL WHERE tasks.status = 'failed'",
+                    (theme, key, batch_id, now),
+                )
+                if cur.rowcount:
+                    added.append(theme)
+            if not added:
+                conn.execute("DELETE FROM batches WHERE id = ?", (batch_id,))
+            return added
+        return self._write(insert)
+
+    def themes(self):
+        """Themes queued, in progress or done (not failed ones, which may be enqueued again), lowercased."""
+        with self._lock:
+            return {row[0].lower() for row in self._connect().execute("SELECT theme FROM tasks WHERE status != 'failed'")}
+
+    def counts(self):
+        with self._lock:
+            return dict(self._connect().execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    # ----------------- Workers -----------------
+    def claim(self, owner):
+        """
+        Leases the oldest queued task, or one whose lease has expired. Returns a dict
+        (id, theme, batch_id, attempts) or None when nothing is claimable. Expired tasks that
+        already used max_attempts are marked failed instead, so a task that kills its worker
+        is not retried forever.
+        """
+        def take(conn):
+            now = time.time()
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', owner = NULL, lease_expires_at = NULL, finished_at = ?,"
+                " last_error = COALESCE(last_error, 'Lease expired; the worker stopped without releasing the task.')"
+                " WHERE status = 'leased' AND lease_expires_at <= ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id, theme, batch_id, attempts FROM tasks"
+                " WHERE status = 'queued' OR (status = 'leased' AND lease_expires_at <= ? AND attempts < ?)"
+                " ORDER BY id LIMIT 1",
+                (now, self.max_attempts),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', owner = ?, lease_expires_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (owner, now + self.lease_seconds, row[0]),
+            )
+            return {"id": row[0], "theme": row[1], "batch_id": row[2], "attempts": row[3] + 1}
+        return self._write(take)
+
+    def heartbeat(self, task_id, owner):
+        """Extends the lease. Returns False when the caller no longer holds it."""
+        def renew(conn):
+            cur = conn.execute(
+                "UPDATE tasks SET lease_expires_at = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, task_id, owner),
+            )
+            return cur.rowcount == 1
+        return self._write(renew)
+
+    def complete(self, task_id, owner):
+        """Marks the task done. Returns False (and changes nothing) when the caller lost the lease."""
+        def finish(conn):
+            cur = conn.execute(
+                "UPDATE tasks SET status = 'done', finished_at = ?, last_error = NULL"
+                " WHERE id = ? AND owner = ? AND status = 'leased'",
+                (time.time(), task_id, owner),
+            )
+            return cur.rowcount == 1
+        return self._write(finish)
+
+    def fail(self, task_id, owner, error):
+        """Returns the task to the queue, or marks it failed after max_attempts. Returns the new status (None if not owner)."""
+        def release(conn):
+            row = conn.execute(
+                "SELECT attempts FROM tasks WHERE id = ? AND owner = ? AND status = 'leased'", (task_id, owner)
+            ).fetchone()
+            if row is None:
+                return None
+            status = "failed" if row[0] >= self.max_attempts else "queued"
+            conn.execute(
+                "UPDATE tasks SET status = ?, owner = NULL, lease_expires_at = NULL, last_error = ?,"
+                " finished_at = CASE WHEN ? = 'failed' THEN ? END WHERE id = ?",
+                (status, str(error)[:1000], status, time.time(), task_id),
+            )
+            return status
+        return self._write(release)
+
+    def batch_articles(self, batch_id):
+        """Articles the coordinator stored with a task's batch (cached per process)."""
+        with self._lock:
+            articles = self._batches.get(batch_id)
+            if articles is None:
+                row = self._connect().execute("SELECT articles FROM batches WHERE id = ?", (batch_id,)).fetchone()
+                articles = json.loads(row[0]) if row else []
+                self._batches[batch_id] = articles
+            return articles
+
+    def lease(self, task, owner):
+        return Lease(self, task, owner)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# ----------------- LEASES -----------------
+class Lease:
+    """
+    Keeps a claimed task's lease alive from a background thread while the worker runs it.
+    check() renews synchronously and raises LeaseLost once the lease is gone; call it before
+    side effects (saving, publishing) so a worker that stalled past its lease stops there.
+    """
+    def __init__(self, queue, task, owner):
+        self.queue = queue
+        self.task = task
+        self.owner = owner
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._beat, name=f"lease-{self.task['id']}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _beat(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(self.task["id"], self.owner):
+                    self.lost.set()
+                    return
+            except Exception as e:
+                print(f"  -> [WARNING] WorkQueue: Heartbeat for task {self.task['id']} failed. Error: {e}")
+
+    def check(self):
+        if self.lost.is_set() or not self.queue.heartbeat(self.task["id"], self.owner):
+            self.lost.set()
+            raise LeaseLost(f"Lease on task {self.task['id']} ('{self.task['theme']}') was lost.")